@@ -1,14 +1,24 @@
 from fastapi import FastAPI, Response, Request, UploadFile, File, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from typing import List, Optional
 import uvicorn
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import asyncio
-from functools import partial
-from concurrent.futures import ThreadPoolExecutor
 import requests
+import httpx
 import re
-from datalearning import DataLearning
+from datalearning import DataLearning, get_data_learning_base
+from cache import SingleFlight, tiered_cache_from_env
+from sources import open_remote_source
+import cdicache
+from cdicache import result_cache as cdi_result_cache, result_key, source_digest
+from graphindex import normalize_key
+from httpclient import get_session, close_session, get_async_client, close_async_client, upstream_limiter
+from jsonldcontext import CDI_FRAME_CONTEXT, context_dir, frame_cdi, warm_cdi_frame
+from jsonldembed import inline_blank_nodes
+from jsonldemit import graph_to_jsonld
+from timing import StageTimer
+import schemaorg
 from config import datadir, datafile
 from datapoints import CDI_DDI
 from cdi import CDI_DDI
@@ -18,26 +28,51 @@ import os
 import json
 import pandas as pd
 import tempfile
+import hashlib
+import sqlite3
 import io
 import csv
 from collections import Counter
-from xlsx2csv import Xlsx2csv
 app = FastAPI()
 
+@app.on_event("shutdown")
+async def shutdown_http_session():
+    close_session()
+    await close_async_client()
+
 # Ensure repo root is importable to access top-level modules
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if REPO_ROOT not in sys.path:
     sys.path.insert(0, REPO_ROOT)
 from cdi_generator import generate_cdi
 from utils import (
-    load_xdi_cdif_mapping,
-    xdi_cdif_mapping_to_jsonld,
-    load_xdi_cdif_mapping_jsonld,
-    xdi_cdif_mapping_to_rml,
+    get_resources_dir,
+    get_xdi_cdif_mapping,
+    warm_xdi_cdif_mapping,
 )
+from spreadsheet import iter_csv, iter_sheet_rows, sheet_names
+
+DVN_DEADLINE = float(os.environ.get("DVN_DEADLINE", 120))
+# (normalised term, vocab) -> Skosmos results; SKOSMOS_CACHE_DB adds a shared SQLite tier
+skosmos_cache = tiered_cache_from_env("SKOSMOS", maxsize=10000, ttl=86400)
+SKOSMOS_NEGATIVE_TTL = float(os.environ.get("SKOSMOS_NEGATIVE_TTL", 300))
+
+def _http_error(e):
+    return {"error": str(e) or type(e).__name__}
+
+async def _get_json(service, url, params, headers, timeout):
+    # One upstream call: bounded by the per-service semaphore and its own timeout.
+    # Non-2xx answers raise httpx.HTTPStatusError, so error pages are never cached
+    async with upstream_limiter(service):
+        resp = await get_async_client().get(url, params=params, headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    try:
+        return resp.json()
+    except ValueError:
+        return resp.text
 
-# Helper: blocking fetch to be executed in thread pool
-def fetch_wikilink(term: str, context: str):
+# Helpers: async fetches sharing one connection pool
+async def fetch_wikilink(term: str, context: str):
     base_url = os.environ.get("SPARQLMUSE", "https://sparqlmuse.now.museum") + "/wikilink/"
     headers = {"accept": "application/json"}
     params = {
@@ -47,74 +82,211 @@ def fetch_wikilink(term: str, context: str):
         "format": "json",
     }
     try:
-        resp = requests.get(base_url, params=params, headers=headers, timeout=15)
-        try:
-            wikilink = resp.json()
-        except ValueError:
-            wikilink = resp.text
-    except requests.RequestException as e:
-        wikilink = {"error": str(e)}
+        wikilink = await _get_json("sparqlmuse", base_url, params, headers, 15)
+    except httpx.HTTPError as e:
+        wikilink = _http_error(e)
     return {"name": term, "wikilink": wikilink}
 
-def fetch_skosmos(term: str, context: str):
+async def fetch_skosmos(term: str, context: str):
     base_url = os.environ.get("CESSDAURL", "https://thesauri.cessda.eu")
     context = "elsst-6"
-    url = base_url + f"/rest/v1/search?query={term}&vocab={context}"
+    url = base_url + "/rest/v1/search"
     headers = {"accept": "application/json"}
     params = {
         "query": term,
         "vocab": context,
     }
+    key = (normalize_key(term), context)
+    result = skosmos_cache.get(key)
+    if result is not None:
+        return {"name": term, "skosmos": result}
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=15)
-        try:
-            skosmos = resp.json()
-        except ValueError:
-            skosmos = resp.text
-    except requests.RequestException as e:
-        skosmos = {"error": str(e)}
+        skosmos = await _get_json("skosmos", url, params, headers, 15)
+    except httpx.HTTPError as e:
+        skosmos = _http_error(e)
     result = []
     if 'results' in skosmos:
         result = skosmos['results']
+        skosmos_cache.set(key, result)
+    else:
+        # Failed lookup: cache the empty answer briefly so a flapping upstream is not hammered
+        skosmos_cache.set(key, result, ttl=SKOSMOS_NEGATIVE_TTL)
     return {"name": term, "skosmos": result}
 
-def fetch_remote_ollama(term: str):
+def remote_ollama_url():
     base_url = os.environ.get("CDIFSERVICE", "https://cdif-4-xas.dev.codata.org/ollama")
     if not 'ollama' in base_url:
         base_url+='/ollama'
+    return base_url
+
+async def fetch_remote_ollama(term: str):
+    base_url = remote_ollama_url()
     headers = {"accept": "application/json"}
     params = {"term": term}
-    try:
-        resp = requests.get(base_url, params=params, headers=headers, timeout=int(os.environ.get("TIMEOUT", 20)))
+    async def fetch():
         try:
-            data = resp.json()
-        except ValueError:
-            data = resp.text
-    except requests.RequestException as e:
-        data = {"error": str(e)}
+            return await _get_json("ollama_remote", base_url, params, headers, int(os.environ.get("TIMEOUT", 20)))
+        except httpx.HTTPError as e:
+            return _http_error(e)
+    # The remote service picks model and prompt; key on its URL instead
+    data = await cached_single_flight(ollama_cache_key("remote", base_url, term), fetch)
     return {"name": term, "ollama_remote": data}
 
-def run_ollama(term: str, model):
-    base_url = os.environ.get("OLLAMASERVICE", "http://10.147.18.82:8093")
-    if not 'http' in base_url:
-        base_url = "http://172.27.39.69:11434"
-    url = base_url + f"/api/generate"
-    headers = {"accept": "application/json", "content-type": "application/json"}
-    prompt = f"create description of variable (definition, units of measurements, properties, attributes) and provide result in json: {term}"
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-    }
+async def fetch_remote_ollama_batch(terms):
+    # One /ollama/batch call for the uncached terms; per-term calls for the rest
+    base_url = remote_ollama_url()
+    results = {}
+    missing = []
+    for term in dict.fromkeys(terms):
+        cached = ollama_cache.get(ollama_cache_key("remote", base_url, term))
+        if cached is not None:
+            results[term] = cached
+        else:
+            missing.append(term)
+    if missing:
+        headers = {"accept": "application/json"}
+        params = [("term", term) for term in missing]
+        async def fetch():
+            try:
+                return await _get_json("ollama_remote", base_url + "/batch", params, headers, int(os.environ.get("OLLAMA_REMOTE_BATCH_TIMEOUT", 120)))
+            except httpx.HTTPError as e:
+                return _http_error(e)
+        data = await ollama_flight.run(ollama_cache_key("remote-batch", base_url, *missing), fetch)
+        if isinstance(data, list):
+            for item in data:
+                if isinstance(item, dict) and item.get("name") in missing and not _has_error(item):
+                    results[item["name"]] = item
+                    ollama_cache.set(ollama_cache_key("remote", base_url, item["name"]), item)
+    # Terms the batch did not answer (or a remote without /ollama/batch)
+    retry = [term for term in missing if term not in results]
+    for result in await asyncio.gather(*(fetch_remote_ollama(term) for term in retry)):
+        results[result["name"]] = result["ollama_remote"]
+    return [{"name": term, "ollama_remote": results[term]} for term in terms]
+
+async def _as_list(awaitable):
+    return [await awaitable]
+
+async def iter_dvn_enrichment(terms, fullcontext, deadline=DVN_DEADLINE):
+    """
+    Run the Skosmos lookups and the batched remote Ollama lookups for all
+    terms concurrently and yield (position, result) as each call finishes.
+    A repeated term is looked up once and its result yielded for every
+    position. Calls still running at the deadline are cancelled and yield
+    an error result instead.
+    """
+    positions = {}
+    for index, term in enumerate(terms):
+        positions.setdefault(term, []).append(index)
+    unique = list(positions)
+    # Each task returns one result per term; tasks[task] lists the
+    # (position, term, key) slots each of those results fills
+    tasks = {}
+    for term in unique:
+        slots = [(2 * index, term, "skosmos") for index in positions[term]]
+        tasks[asyncio.ensure_future(_as_list(fetch_skosmos(term, fullcontext)))] = [slots]
+    batch_size = max(1, int(os.environ.get("OLLAMA_REMOTE_BATCH_SIZE", 10)))
+    for start in range(0, len(unique), batch_size):
+        chunk = unique[start:start + batch_size]
+        slots = [[(2 * index + 1, term, "ollama_remote") for index in positions[term]] for term in chunk]
+        tasks[asyncio.ensure_future(fetch_remote_ollama_batch(chunk))] = slots
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline if deadline else None
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=30)
+        while pending:
+            timeout = None if end is None else max(0, end - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                if task.exception() is not None:
+                    for slots in tasks[task]:
+                        for position, term, key in slots:
+                            yield position, {"name": term, key: _http_error(task.exception())}
+                else:
+                    for slots, result in zip(tasks[task], task.result()):
+                        for position, term, key in slots:
+                            yield position, result
+        for task in pending:
+            task.cancel()
+            for slots in tasks[task]:
+                for position, term, key in slots:
+                    yield position, {"name": term, key: {"error": "deadline of %ss exceeded" % deadline}}
+    finally:
+        # Client went away or the deadline passed: stop the outstanding calls
+        for task in pending:
+            task.cancel()
+
+def ndjson(record):
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def stream_dvn(variables, terms, fullcontext):
+    # One line per variable once both its Skosmos and remote Ollama results are in
+    records = [{"name": term, "variable": variable} for term, variable in zip(terms, variables)]
+    missing = [2] * len(terms)
+    async for position, result in iter_dvn_enrichment(terms, fullcontext):
+        index, is_ollama = divmod(position, 2)
+        key = "ollama_remote" if is_ollama else "skosmos"
+        records[index][key] = result.get(key)
+        missing[index] -= 1
+        if not missing[index]:
+            yield ndjson(records[index])
+
+OLLAMA_PROMPT_TEMPLATE = "create description of variable (definition, units of measurements, properties, attributes) and provide result in json: {term}"
+OLLAMA_BATCH_PROMPT_TEMPLATE = (
+    "create description of each of the following variables (definition, units of measurements, properties, attributes) "
+    "and provide the result in json as one object whose keys are the variable names exactly as given "
+    "and whose values are the descriptions: {terms}"
+)
+# Content-addressed cache of parsed generations, persistent by default
+ollama_cache = tiered_cache_from_env(
+    "OLLAMA",
+    maxsize=5000,
+    ttl=30 * 86400,
+    path=os.path.join(tempfile.gettempdir(), "cdi-xas-cache", "ollama.sqlite"),
+)
+ollama_flight = SingleFlight()
+# Entries written under another DEFAULTMODEL or prompt template are dropped at startup
+OLLAMA_CACHE_GENERATION = hashlib.sha256(
+    json.dumps([os.environ.get("DEFAULTMODEL", "gpt-oss:latest"), OLLAMA_PROMPT_TEMPLATE, OLLAMA_BATCH_PROMPT_TEMPLATE]).encode("utf-8")
+).hexdigest()[:16]
+
+def ollama_cache_key(*parts):
+    return OLLAMA_CACHE_GENERATION + ":" + hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _has_error(value):
+    return isinstance(value, dict) and ("error" in value or _has_error(value.get("ollama")))
+
+@app.on_event("startup")
+def warm_mapping_cache():
+    warm_xdi_cdif_mapping()
+
+@app.on_event("startup")
+def warm_jsonld_frame():
+    warm_cdi_frame()
+
+@app.on_event("startup")
+def invalidate_ollama_cache():
+    if ollama_cache.disk is not None:
         try:
-            data = resp.json()
-            raw = data.get("response", data)
-        except ValueError:
-            raw = resp.text
-    except requests.RequestException as e:
-        return {"name": term, "ollama": {"error": str(e)}}
+            ollama_cache.disk.purge_except(OLLAMA_CACHE_GENERATION + ":")
+        except sqlite3.Error as e:
+            print("Warning: could not open Ollama cache %s: %s" % (ollama_cache.disk.path, e))
+            ollama_cache.disk = None
+
+async def cached_single_flight(key, fetch):
+    # Cache hit, else one shared upstream call per key; errors are not cached
+    cached = ollama_cache.get(key)
+    if cached is not None:
+        return cached
+    async def load():
+        value = await fetch()
+        if not _has_error(value):
+            ollama_cache.set(key, value)
+        return value
+    return await ollama_flight.run(key, load)
+
+def parse_ollama_response(raw):
     # Parse fenced JSON from response if present
     if isinstance(raw, str):
         text = raw.strip()
@@ -140,11 +312,175 @@ def run_ollama(term: str, model):
                     parsed = json.loads(candidate2)
                 except Exception:
                     parsed = None
-        ollama = parsed if parsed is not None else raw
-    else:
-        ollama = raw
+        return parsed if parsed is not None else raw
+    return raw
+
+async def generate_ollama(prompt: str, model, timeout=30):
+    base_url = os.environ.get("OLLAMASERVICE", "http://10.147.18.82:8093")
+    if not 'http' in base_url:
+        base_url = "http://172.27.39.69:11434"
+    url = base_url + f"/api/generate"
+    headers = {"accept": "application/json", "content-type": "application/json"}
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+    }
+    try:
+        async with upstream_limiter("ollama"):
+            resp = await get_async_client().post(url, json=payload, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        try:
+            data = resp.json()
+            raw = data.get("response", data)
+        except ValueError:
+            raw = resp.text
+    except httpx.HTTPError as e:
+        return _http_error(e)
+    return parse_ollama_response(raw)
+
+async def run_ollama(term: str, model):
+    key = ollama_cache_key("generate", model, OLLAMA_PROMPT_TEMPLATE, term)
+    ollama = await cached_single_flight(key, lambda: generate_ollama(OLLAMA_PROMPT_TEMPLATE.format(term=term), model))
     return {"name": term, "ollama": ollama}
 
+async def stream_ollama(term: str, model):
+    """
+    Relay an Ollama generation as NDJSON: {"name", "token"} lines while
+    the model streams, then a final {"name", "ollama", "done": true} line
+    with the parsed result. Cached or already running generations only
+    produce the final line.
+    """
+    key = ollama_cache_key("generate", model, OLLAMA_PROMPT_TEMPLATE, term)
+    ollama = ollama_cache.get(key)
+    if ollama is None and ollama_flight.inflight(key) is not None:
+        ollama = await asyncio.shield(ollama_flight.inflight(key))
+    if ollama is not None:
+        yield ndjson({"name": term, "ollama": ollama, "done": True})
+        return
+    base_url = os.environ.get("OLLAMASERVICE", "http://10.147.18.82:8093")
+    if not 'http' in base_url:
+        base_url = "http://172.27.39.69:11434"
+    url = base_url + f"/api/generate"
+    headers = {"accept": "application/x-ndjson", "content-type": "application/json"}
+    payload = {
+        "model": model,
+        "prompt": OLLAMA_PROMPT_TEMPLATE.format(term=term),
+        "stream": True,
+    }
+    tokens = []
+    try:
+        async with upstream_limiter("ollama"):
+            async with get_async_client().stream("POST", url, json=payload, headers=headers, timeout=30) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    try:
+                        chunk = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "error" in chunk:
+                        yield ndjson({"name": term, "ollama": {"error": chunk["error"]}, "done": True})
+                        return
+                    token = chunk.get("response")
+                    if token:
+                        tokens.append(token)
+                        yield ndjson({"name": term, "token": token})
+                    if chunk.get("done"):
+                        break
+    except httpx.HTTPError as e:
+        yield ndjson({"name": term, "ollama": _http_error(e), "done": True})
+        return
+    ollama = parse_ollama_response("".join(tokens))
+    if not _has_error(ollama):
+        ollama_cache.set(key, ollama)
+    yield ndjson({"name": term, "ollama": ollama, "done": True})
+
+def ollama_batch_size(model):
+    # OLLAMA_BATCH_SIZES="model=n,model2=m" overrides OLLAMA_BATCH_SIZE (default 10) per model
+    for item in os.environ.get("OLLAMA_BATCH_SIZES", "").split(","):
+        name, sep, size = item.rpartition("=")
+        if sep and name.strip() == model:
+            return max(1, int(size))
+    return max(1, int(os.environ.get("OLLAMA_BATCH_SIZE", 10)))
+
+def split_batch_response(parsed, terms):
+    """
+    Map a parsed batch generation back to {term: description}. Accepts an
+    object keyed by term (optionally wrapped in a single top-level key) or
+    a list of objects naming their term; terms that cannot be found are
+    left out.
+    """
+    lookup = {normalize_key(term): term for term in terms}
+    if isinstance(parsed, dict) and len(parsed) == 1:
+        key, inner = next(iter(parsed.items()))
+        if normalize_key(key) not in lookup and isinstance(inner, (dict, list)):
+            parsed = inner
+    results = {}
+    if isinstance(parsed, dict):
+        for key, value in parsed.items():
+            term = lookup.get(normalize_key(key))
+            if term is not None:
+                results.setdefault(term, value)
+    elif isinstance(parsed, list):
+        for item in parsed:
+            if not isinstance(item, dict):
+                continue
+            for field in ("name", "term", "variable"):
+                term = lookup.get(normalize_key(item.get(field, "")))
+                if term is not None:
+                    results.setdefault(term, item)
+                    break
+        if not results and len(parsed) == len(terms):
+            results = dict(zip(terms, parsed))
+    return results
+
+async def generate_ollama_batch(terms, model):
+    prompt = OLLAMA_BATCH_PROMPT_TEMPLATE.format(terms=json.dumps(terms, ensure_ascii=False))
+    parsed = await generate_ollama(prompt, model, timeout=30 * len(terms))
+    if _has_error(parsed):
+        return {}
+    if isinstance(parsed, str):
+        # parse_ollama_response only extracts objects; the model may answer with an array
+        match = re.search(r"(\[[\s\S]*\])", parsed)
+        try:
+            parsed = json.loads(match.group(1)) if match else parsed
+        except ValueError:
+            pass
+    return split_batch_response(parsed, terms)
+
+async def run_ollama_batch(terms, model, batch_size=None):
+    """
+    Describe many terms with one generation per batch_size terms. Results
+    are cached per term; terms a batch fails to answer fall back to
+    run_ollama. Returns [{"name", "ollama"}] in the order of terms.
+    """
+    batch_size = batch_size or ollama_batch_size(model)
+    results = {}
+    missing = []
+    for term in dict.fromkeys(terms):
+        cached = ollama_cache.get(ollama_cache_key("generate", model, OLLAMA_BATCH_PROMPT_TEMPLATE, term))
+        if cached is None:
+            cached = ollama_cache.get(ollama_cache_key("generate", model, OLLAMA_PROMPT_TEMPLATE, term))
+        if cached is not None:
+            results[term] = cached
+        else:
+            missing.append(term)
+
+    async def run_chunk(chunk):
+        key = ollama_cache_key("batch", model, OLLAMA_BATCH_PROMPT_TEMPLATE, *chunk)
+        answered = await ollama_flight.run(key, lambda: generate_ollama_batch(chunk, model))
+        for term, value in answered.items():
+            results[term] = value
+            if not _has_error(value):
+                ollama_cache.set(ollama_cache_key("generate", model, OLLAMA_BATCH_PROMPT_TEMPLATE, term), value)
+        # Items the model skipped or that did not parse: one prompt each
+        retry = [term for term in chunk if term not in answered]
+        for result in await asyncio.gather(*(run_ollama(term, model) for term in retry)):
+            results[result["name"]] = result["ollama"]
+
+    await asyncio.gather(*(run_chunk(missing[i:i + batch_size]) for i in range(0, len(missing), batch_size)))
+    return [{"name": term, "ollama": results[term]} for term in terms]
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -154,7 +490,10 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-data = DataLearning(datadir, datafile, format="json-ld")
+# Per-worker shared base (full graph + default configuration); requests
+# work on cheap overlays of it
+data_base = get_data_learning_base(datadir, datafile, format="json-ld")
+data = data_base.overlay()
 data.load_data()
 data.get_data()
 
@@ -162,9 +501,16 @@ data.get_data()
 def read_root():
     return {"message": "DDI-CDI Service v.0.1"}
 
+def _remote_source(url):
+    # Request parameters may name http(s) URLs only, never files on this server
+    try:
+        return open_remote_source(url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/cdi-intermidiate")
 def read_cdi(url: str, format: str = "turtle"):
-    cdi = CDI_DDI(url, "cdi.jsonld", format, type='xas')
+    cdi = CDI_DDI(_remote_source(url), type='xas')
     if format == "turtle":
         return Response(content=cdi.parse_cdi().serialize(format=format), media_type="text/turtle")
     else:
@@ -215,26 +561,20 @@ def xdi_cdif_mapping_from_url(
     # Case 1: we have an explicit or derived spreadsheet URL/path
     if effective_url:
         try:
-            df = pd.read_excel(effective_url)
+            mapping = get_xdi_cdif_mapping(effective_url)
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to load spreadsheet from '{effective_url}': {e}",
             )
-        if export == "rml":
-            rml_mapping = xdi_cdif_mapping_to_rml(df)
-            return Response(content=rml_mapping, media_type="text/turtle")
-        jsonld = xdi_cdif_mapping_to_jsonld(df)
-        return JSONResponse(content=jsonld)
-
     # Case 2: no URL at all – use default mapping from utils
-    if export == "rml":
-        df = load_xdi_cdif_mapping()
-        rml_mapping = xdi_cdif_mapping_to_rml(df)
-        return Response(content=rml_mapping, media_type="text/turtle")
+    else:
+        mapping = get_xdi_cdif_mapping()
 
-    jsonld = load_xdi_cdif_mapping_jsonld()
-    return JSONResponse(content=jsonld)
+    # Both representations are precomputed and cached with the spreadsheet
+    if export == "rml":
+        return Response(content=mapping.rml, media_type="text/turtle")
+    return Response(content=mapping.jsonld_bytes, media_type="application/json")
 
 @app.get("/data")
 def read_data():
@@ -249,7 +589,7 @@ def read_data_example(configurationfile: Optional[str] = None):
             configurationfile = datadir + "/" + configurationfile
         else:
             configurationfile = configurationfile
-    data = DataLearning(datadir, configurationfile, format="json-ld")
+    data = data_base.overlay(configurationfile)
     data.load_data()
     data.get_data()
     data.add_permanent_schema('dataset')
@@ -267,35 +607,45 @@ def read_data_example(configurationfile: Optional[str] = None):
 
 @app.get("/data/dataset")
 def read_data_dataset(url: str):
-    data = DataLearning(datadir, url, format="json-ld")
+    source = _remote_source(url)
+    data = data_base.overlay(url)
     data.load_data()
     data.get_data()
     data.add_permanent_schema('dataset')
     #return Response(content=data.serialize_data(format="json-ld"), media_type="application/json")
     datajson = data.export(format="json-ld")
     # Generate CDI graph using shared generator
-    cdi_graph = generate_cdi(url, None, "json-ld", None, 'xas')
-    cdi_jsonld = cdi_graph.serialize(format="json-ld")
+    cdi_graph = generate_cdi(url, None, "json-ld", None, 'xas', source=source)
     dataexport = json.dumps({
         "@context": [
             "https://docs.ddialliance.org/DDI-CDI/1.0/model/encoding/json-ld/ddi-cdi.jsonld",
             {"skos": "http://www.w3.org/2004/02/skos/core#"}
         ],      
         "DDICDIModels": [json.loads(datajson)],
-        "CDIGenerated": json.loads(cdi_jsonld)
-    })
+        "CDIGenerated": graph_to_jsonld(cdi_graph)
+    }, allow_nan=False)
     return Response(content=dataexport, media_type="application/json")
 
 @app.get("/datapoints")
 def read_datapoints(url: str, format: str = "turtle"):
-    cdi = CDI_DDI(url, "cdi.jsonld", format, type='xas')
+    cdi = CDI_DDI(_remote_source(url), type='xas')
     if format == "turtle":
         return Response(content=cdi.parse_cdi().serialize(format=format), media_type="text/turtle")
     else:
         return Response(content=cdi.parse_cdi().serialize(format=format), media_type="application/json")
 
+def encode_json_object(payload):
+    # Same bytes as json.dumps(payload), but bytes values are spliced in as
+    # pre-encoded JSON; NaN/Infinity would not be valid JSON, so they fail here
+    parts = []
+    for key, value in payload.items():
+        encoded = value if isinstance(value, bytes) else json.dumps(value, allow_nan=False).encode("utf-8")
+        parts.append(json.dumps(key).encode("utf-8") + b": " + encoded)
+    return b"{" + b", ".join(parts) + b"}"
+
 @app.get("/cdi")
 def cdi_generate(
+    request: Request,
     url: Optional[str] = Query(None),
     format: str = "json-ld",
     resources: Optional[str] = None,
@@ -315,74 +665,75 @@ def cdi_generate(
         source_url = url
     if not source_url:
         raise HTTPException(status_code=400, detail="Provide either 'url' or both 'fileid' and 'siteUrl'.")
-    graph = generate_cdi(source_url, None, format, resources, type, datasetid, datasetversion)
-    cdi_jsonld = graph.serialize(format="json-ld")
-    datajson = cdi_jsonld
+    source = _remote_source(source_url)
+    timer = StageTimer()
+    # Documents are cached under a hash of the source content and every
+    # other input; the key is also the ETag
+    with timer.stage("source"):
+        try:
+            digest, downloaded = source_digest(source_url)
+        except Exception as e:
+            # Not cacheable; generation below reports unreadable sources
+            print("Warning: could not fingerprint %s, not caching: %s" % (source_url, e))
+            digest = downloaded = None
+    try:
+        return _cdi_response(request, timer, digest, downloaded or source, source_url, format, resources, type, datasetid, datasetversion)
+    finally:
+        if downloaded is not None:
+            # Drops the temporary copy made while hashing the source
+            downloaded.close()
+
+def _cdi_response(request, timer, digest, source, source_url, format, resources, type, datasetid, datasetversion):
+    key = None
+    if digest is not None:
+        with timer.stage("cache"):
+            params = {"format": format, "type": type, "datasetid": datasetid, "datasetversion": datasetversion}
+            resources_dirs = (get_resources_dir(resources), get_resources_dir(), context_dir())
+            dataset = schemaorg.dataset_key(source_url, datasetid, datasetversion)
+            key = result_key(digest, params, resources_dirs, dataset)
+            headers = {"ETag": '"%s"' % key, "Cache-Control": "no-cache"}
+            if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+                return Response(status_code=304, headers=dict(headers, **{"Server-Timing": timer.server_timing()}))
+            cached = cdi_result_cache.get(key)
+        if cached is not None:
+            headers.update({"X-Cache": "hit", "Server-Timing": timer.server_timing()})
+            return Response(content=cached, media_type="application/json", headers=headers)
+    dataexport = _build_cdi_document(source_url, source, format, resources, type, datasetid, datasetversion, timer)
+    headers = {"X-Cache": "miss"}
+    # Stored only if the schema.org export did not change meanwhile, so
+    # the key describes exactly what was generated
+    if key is not None and result_key(digest, params, resources_dirs, dataset) == key:
+        cdi_result_cache.set(key, dataexport)
+        headers.update({"ETag": '"%s"' % key, "Cache-Control": "no-cache"})
+    headers["Server-Timing"] = timer.server_timing()
+    return Response(content=dataexport, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+def _build_cdi_document(source_url, source, format, resources, type, datasetid, datasetversion, timer):
+    try:
+        graph = generate_cdi(source_url, None, format, resources, type, datasetid, datasetversion, timer=timer, source=source)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Emitted once: framed below and embedded as-is in CDIGenerated (pyld
+    # does not modify its input)
+    with timer.stage("emit"):
+        cdi_nodes = graph_to_jsonld(graph)
     # Try to embed distribution nodes instead of blank-node references using JSON-LD framing
-    #print("DEBUG: " + str(datajson))
     try:
-        from pyld import jsonld as jsonldlib
-        doc = json.loads(datajson)
-        # Use a rich context so keys compact to prefixes like schema:, spdx:, dcterms:, etc.
-        frame_context = {
-            "@vocab": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
-            "schema": "https://schema.org/",
-            "dcterms": "http://purl.org/dc/terms/",
-            "geosparql": "http://www.opengis.net/ont/geosparql#",
-            "spdx": "http://spdx.org/rdf/terms#",
-            "cdi": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
-            "time": "http://www.w3.org/2006/time#",
-            "skos": "http://www.w3.org/2004/02/skos/core#",
-            "nx": "https://xas.org/dictionary/",
-            "cdifq": "https://cdif.codata.org/concept/",
-            "prov": "http://www.w3.org/ns/prov#"
-        }
-        frame = {
-            "@context": frame_context,
-            "@type": "schema:Dataset",
-            "@embed": "@always",
-            "@explicit": False
-        }
-        framed = jsonldlib.frame(doc, frame)
-        compacted = jsonldlib.compact(framed, frame_context)
+        # Keys compact to prefixes like schema:, spdx:, dcterms:, etc.; the
+        # frame and its context are built once and framing never goes online
+        with timer.stage("frame"):
+            compacted = frame_cdi(cdi_nodes)
         # Post-process: inline blank-node references {"@id": "_:b..."} with their full node objects
-        def collect_nodes(obj, store):
-            if isinstance(obj, dict):
-                node_id = obj.get("@id")
-                if node_id and node_id.startswith("_:"):
-                    store[node_id] = obj
-                for v in obj.values():
-                    collect_nodes(v, store)
-            elif isinstance(obj, list):
-                for v in obj:
-                    collect_nodes(v, store)
-        def deep_clone(o):
-            try:
-                return json.loads(json.dumps(o))
-            except Exception:
-                return o
-        def inline_refs(obj, node_map, seen_ids):
-            if isinstance(obj, dict):
-                # If this is a bare reference to a blank node, inline it
-                if set(obj.keys()) == {"@id"} and isinstance(obj.get("@id"), str) and obj["@id"].startswith("_:"):
-                    ref_id = obj["@id"]
-                    target = node_map.get(ref_id)
-                    if target and ref_id not in seen_ids:
-                        seen_ids.add(ref_id)
-                        inlined = inline_refs(deep_clone(target), node_map, seen_ids)
-                        seen_ids.discard(ref_id)
-                        return inlined
-                    return obj
-                # Otherwise recursively inline children
-                return {k: inline_refs(v, node_map, seen_ids) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [inline_refs(v, node_map, seen_ids) for v in obj]
-            return obj
-        node_map = {}
-        collect_nodes(compacted, node_map)
-        ddicdi_models = inline_refs(compacted, node_map, set())
+        with timer.stage("inline"):
+            ddicdi_models = inline_blank_nodes(compacted)
     except Exception:
-        ddicdi_models = json.loads(datajson)
+        ddicdi_models = cdi_nodes
     # Wrap output with requested top-level @context and @graph
     if isinstance(ddicdi_models, dict) and "@graph" in ddicdi_models:
         graph_nodes = ddicdi_models.get("@graph", [])
@@ -390,24 +741,12 @@ def cdi_generate(
         graph_nodes = ddicdi_models
     else:
         graph_nodes = [ddicdi_models]
-    top_context = {
-        "@vocab": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
-        "schema": "https://schema.org/",
-        "dcterms": "http://purl.org/dc/terms/",
-        "geosparql": "http://www.opengis.net/ont/geosparql#",
-        "spdx": "http://spdx.org/rdf/terms#",
-        "cdi": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
-        "time": "http://www.w3.org/2006/time#",
-        "skos": "http://www.w3.org/2004/02/skos/core#",
-        "nx": "https://xas.org/dictionary/",
-        "cdifq": "https://cdif.codata.org/concept/",
-        "prov": "http://www.w3.org/ns/prov#"
-    }
+    top_context = CDI_FRAME_CONTEXT
 
     # Also include the XDI–CDIF mapping JSON-LD generated from the
-    # spreadsheet resources, using the same logic as in the notebook.
+    # spreadsheet resources (cached and already encoded).
     try:
-        xdi_cdif_mapping = load_xdi_cdif_mapping_jsonld()
+        xdi_cdif_mapping = get_xdi_cdif_mapping().jsonld_bytes
     except Exception:
         xdi_cdif_mapping = None
 
@@ -423,14 +762,10 @@ def cdi_generate(
     # Also attach the original CDI JSON-LD graph (schema.org-rich) so
     # clients can access the full generated CDI, just like in the
     # `test_cdi_generate.ipynb` notebook.
-    try:
-        payload["CDIGenerated"] = json.loads(cdi_jsonld)
-    except Exception:
-        # Fallback: keep raw string if parsing fails for any reason
-        payload["CDIGenerated"] = cdi_jsonld
+    payload["CDIGenerated"] = cdi_nodes
 
-    dataexport = json.dumps(payload)
-    return Response(content=dataexport, media_type="application/json")
+    with timer.stage("encode"):
+        return encode_json_object(payload)
 
 @app.get("/data/serialize")
 def read_data_serialize():
@@ -454,13 +789,27 @@ def list_routes():
             pass
     return routes
 
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "skosmos": skosmos_cache.stats(),
+        "ollama": dict(ollama_cache.stats(), flight=ollama_flight.stats()),
+        "schemaorg": schemaorg.stats(),
+        "cdi": cdicache.stats(),
+    }
+
 @app.get("/data/properties")
 def read_data_properties(subject: str):
     return data.get_related_triples(data.fullgraph, subject)
 
 @app.get("/data/triple_by_triple")
-def read_data_triple_by_triple(subject: str):
-    return data.triple_by_triple(data.fullgraph, subject)
+def read_data_triple_by_triple(
+    subject: str,
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of triples to return."),
+    offset: int = Query(0, ge=0, description="Number of matching triples to skip."),
+):
+    total, triples = data.search_triples(data.fullgraph, subject, limit, offset)
+    return JSONResponse(content=triples, headers={"X-Total-Count": str(total)})
 
 @app.get("/data/lookup")
 def read_data_lookup(subject: str):
@@ -479,7 +828,7 @@ def read_data_lookup_subject(subject: str):
     return data.lookup_subject(subject)
 
 @app.post("/dvn")
-async def receive_dvn(request: Request, file: Optional[UploadFile] = File(None)):
+async def receive_dvn(request: Request, file: Optional[UploadFile] = File(None), stream: bool = Query(False, description="Stream one NDJSON enrichment record per variable as soon as its lookups finish")):
     # If a file is uploaded via multipart/form-data
     if file is not None:
         content_bytes = await file.read()
@@ -512,18 +861,14 @@ async def receive_dvn(request: Request, file: Optional[UploadFile] = File(None))
                                 context.append(variable.get("name"))
             output = { "variables": variables, "context": context }
             fullcontext = " ".join(context)
-            loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor(max_workers=min(10, len(variables) or 1)) as executor:
-                tasks = []
-                for variable in variables:
-                    term = variable.get("name")
-                    if not term:
-                        continue
-#                    tasks.append(loop.run_in_executor(executor, partial(fetch_wikilink, term, fullcontext)))
-                    tasks.append(loop.run_in_executor(executor, partial(fetch_skosmos, term, fullcontext)))
-                    tasks.append(loop.run_in_executor(executor, partial(fetch_remote_ollama, term)))
-                results = await asyncio.gather(*tasks)
-            output["results"] = list(results)
+            terms = [variable.get("name") for variable in variables if variable.get("name")]
+            if stream:
+                named = [variable for variable in variables if variable.get("name")]
+                return StreamingResponse(stream_dvn(named, terms, fullcontext), media_type="application/x-ndjson")
+            results = [None] * (2 * len(terms))
+            async for position, result in iter_dvn_enrichment(terms, fullcontext):
+                results[position] = result
+            output["results"] = results
             return Response(content=json.dumps(output, indent=2, ensure_ascii=False), media_type="application/json")
         else:
             print(json.dumps(variables, indent=2, ensure_ascii=False))
@@ -536,22 +881,63 @@ async def receive_dvn(request: Request, file: Optional[UploadFile] = File(None))
         return PlainTextResponse(content=text)
 
 @app.get("/ollama")
-async def receive_ollama(term: str, model: Optional[str] = os.environ.get("DEFAULTMODEL", "gpt-oss:latest")):
-    return run_ollama(term, model)
+async def receive_ollama(
+    term: str,
+    model: Optional[str] = os.environ.get("DEFAULTMODEL", "gpt-oss:latest"),
+    stream: bool = Query(False, description="Relay tokens as NDJSON while the model generates"),
+):
+    if stream:
+        return StreamingResponse(stream_ollama(term, model), media_type="application/x-ndjson")
+    return await run_ollama(term, model)
+
+@app.get("/ollama/batch")
+async def receive_ollama_batch(
+    term: List[str] = Query(..., description="Variable names / concepts to describe (repeat the parameter)"),
+    model: Optional[str] = os.environ.get("DEFAULTMODEL", "gpt-oss:latest"),
+    batch_size: Optional[int] = Query(None, ge=1, description="Terms per generation; defaults to the per-model OLLAMA_BATCH_SIZES / OLLAMA_BATCH_SIZE"),
+):
+    return await run_ollama_batch(term, model, batch_size)
+
+def iter_markitdown_csv(data, sheet=None):
+    """
+    CSV text chunks of the workbook bytes ``data``. ``sheet`` keeps the
+    xlsx2csv ``sheetid`` convention: a 1-based index, ``0`` for every
+    sheet (each preceded by a ``-------- <n> - <name>`` line), or a name.
+    """
+    if sheet is None:
+        return iter_csv(iter_sheet_rows(data))
+    try:
+        sheet_index = int(sheet)
+    except ValueError:
+        return iter_csv(iter_sheet_rows(data, sheet))
+    if sheet_index != 0:
+        return iter_csv(iter_sheet_rows(data, sheet_index - 1))
+    names = sheet_names(data)
+
+    def all_sheets():
+        for index, name in enumerate(names):
+            yield "-------- %d - %s\n" % (index + 1, name)
+            yield from iter_csv(iter_sheet_rows(data, index))
+
+    return all_sheets()
 
 @app.get("/markitdown")
 def markitdown(
     url: str = Query(..., description="URL of the Excel file to convert to CSV"),
-    sheet: Optional[str] = Query(None, description="Optional sheet name or index (0-based) to convert. If not specified, converts the first sheet."),
+    sheet: Optional[str] = Query(None, description="Optional sheet name or 1-based index to convert (0 converts every sheet). If not specified, converts the first sheet."),
     analyze: Optional[bool] = Query(False, description="If True, returns JSON with row analysis and CSV content. If False, returns only CSV.")
 ):
     """
-    Download an Excel file from a URL and convert it to CSV format using xlsx2csv.
+    Download an Excel file from a URL and convert it to CSV format.
     Optionally analyzes rows by delimiter-separated column count.
+
+    The workbook is parsed from memory by the streaming reader in
+    ``spreadsheet.py`` (no temporary file) and, without ``analyze``, the
+    CSV is streamed to the client as rows are read.
     
     Args:
-        url: URL of the Excel file (.xlsx or .xls) to download and convert
-        sheet: Optional sheet name or index (0-based). If not specified, converts the first sheet.
+        url: URL of the Excel file (.xlsx, or any format python-calamine reads when installed)
+        sheet: Optional sheet name or 1-based index; 0 converts every sheet. If not specified, converts the first sheet.
         analyze: If True, returns JSON with row analysis grouping rows by column count.
                  If False, returns only CSV content as plain text.
     
@@ -561,102 +947,65 @@ def markitdown(
     """
     try:
         # Download the file from URL
-        response = requests.get(url, timeout=30)
+        response = get_session().get(url, timeout=30)
         response.raise_for_status()
+
+        # Opens the workbook and resolves the sheet; rows are read lazily
+        chunks = iter_markitdown_csv(response.content, sheet)
+
+        # If analyze is False, stream CSV content as plain text
+        if not analyze:
+            return StreamingResponse(chunks, media_type="text/csv")
+
+        # Analyze rows by delimiter-separated column count
+        csv_content = "".join(chunks)
+        rows = list(csv.reader(io.StringIO(csv_content)))
         
-        # Determine file extension from URL or Content-Type header
-        content_type = response.headers.get('Content-Type', '').lower()
-        if '.xls' in url.lower() or 'spreadsheet' in content_type or 'excel' in content_type:
-            suffix = '.xlsx' if '.xlsx' in url.lower() or 'openxml' in content_type else '.xls'
+        # Count columns in each row
+        row_column_counts = [len(row) for row in rows]
+        
+        # Find the most common column count (this represents data rows)
+        if row_column_counts:
+            column_count_counter = Counter(row_column_counts)
+            most_common_count = column_count_counter.most_common(1)[0][0]
         else:
-            suffix = '.xlsx'  # Default to .xlsx
+            column_count_counter = Counter()  # Initialize empty Counter for empty CSV
+            most_common_count = 0
         
-        # Create a temporary file to store the downloaded Excel file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            tmp_file.write(response.content)
-            tmp_path = tmp_file.name
+        # Group rows into two categories:
+        # 1. Rows with the same size as data rows (most common count)
+        # 2. Rows with different size
+        same_size_rows = []
+        different_size_rows = []
         
-        try:
-            # Convert Excel to CSV using xlsx2csv
-            output_buffer = io.StringIO()
-            converter = Xlsx2csv(tmp_path, outputencoding="utf-8")
-            
-            # If sheet is specified, convert only that sheet
-            if sheet is not None:
-                # Try to convert by sheet index first (if it's a number)
-                try:
-                    sheet_index = int(sheet)
-                    converter.convert(output_buffer, sheetid=sheet_index)
-                except ValueError:
-                    # sheet is a name, not an index
-                    converter.convert(output_buffer, sheetname=sheet)
-            else:
-                # Convert first sheet by default
-                converter.convert(output_buffer)
-            
-            csv_content = output_buffer.getvalue()
-            
-            # If analyze is False, return CSV content as plain text
-            if not analyze:
-                return PlainTextResponse(content=csv_content, media_type="text/csv")
-            
-            # Analyze rows by delimiter-separated column count
-            output_buffer.seek(0)  # Reset buffer position
-            csv_reader = csv.reader(output_buffer)
-            rows = list(csv_reader)
-            
-            # Count columns in each row
-            row_column_counts = [len(row) for row in rows]
-            
-            # Find the most common column count (this represents data rows)
-            if row_column_counts:
-                column_count_counter = Counter(row_column_counts)
-                most_common_count = column_count_counter.most_common(1)[0][0]
-            else:
-                column_count_counter = Counter()  # Initialize empty Counter for empty CSV
-                most_common_count = 0
-            
-            # Group rows into two categories:
-            # 1. Rows with the same size as data rows (most common count)
-            # 2. Rows with different size
-            same_size_rows = []
-            different_size_rows = []
-            
-            for idx, row in enumerate(rows):
-                row_info = {
-                    "row_index": idx,
-                    "column_count": len(row),
-                    "columns": row
-                }
-                if len(row) == most_common_count:
-                    same_size_rows.append(row_info)
-                else:
-                    different_size_rows.append(row_info)
-            
-            # Prepare analysis result
-            analysis = {
-                "total_rows": len(rows),
-                "most_common_column_count": most_common_count,
-                "column_count_distribution": dict(column_count_counter),
-                "same_size_rows": {
-                    "count": len(same_size_rows),
-                    "rows": same_size_rows
-                },
-                "different_size_rows": {
-                    "count": len(different_size_rows),
-                    "rows": different_size_rows
-                },
-                "csv_content": csv_content
+        for idx, row in enumerate(rows):
+            row_info = {
+                "row_index": idx,
+                "column_count": len(row),
+                "columns": row
             }
-            
-            return JSONResponse(content=analysis)
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
+            if len(row) == most_common_count:
+                same_size_rows.append(row_info)
+            else:
+                different_size_rows.append(row_info)
+        
+        # Prepare analysis result
+        analysis = {
+            "total_rows": len(rows),
+            "most_common_column_count": most_common_count,
+            "column_count_distribution": dict(column_count_counter),
+            "same_size_rows": {
+                "count": len(same_size_rows),
+                "rows": same_size_rows
+            },
+            "different_size_rows": {
+                "count": len(different_size_rows),
+                "rows": different_size_rows
+            },
+            "csv_content": csv_content
+        }
+        
+        return JSONResponse(content=analysis)
                 
     except requests.RequestException as e:
         raise HTTPException(
@@ -0,0 +1,426 @@
+"""
+Result caches for upstream lookups.
+
+:class:`TTLCache` is a bounded in-memory LRU whose entries expire after a
+per-entry TTL. :class:`SQLiteCache` is an optional on-disk tier (WAL
+mode) that survives restarts and is shared by every worker process that
+opens the same file. :class:`TieredCache` combines the two: reads try
+memory first, then disk (promoting hits into memory), writes go to both.
+
+Values must be JSON-serialisable. Every cache keeps hit/miss counters,
+available through ``stats()``.
+
+For large ``bytes`` values (generated documents), :class:`ByteLRUCache`
+bounds memory by total size instead of entry count and
+:class:`FileCache` keeps one file per entry in a size-bounded directory;
+both plug into :class:`TieredCache` like the tiers above.
+
+:class:`SingleFlight` coalesces concurrent coroutine calls with the same
+key onto one in-flight upstream call.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache of at most ``maxsize`` entries, each with its own expiry."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """
+    Key/value cache in an SQLite file with absolute expiry times. Each
+    process opens its own connection; WAL mode lets several gunicorn
+    workers read and write the same file concurrently.
+    """
+
+    def __init__(self, path: str, table: str = "cache"):
+        self.path = path
+        self.table = table
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)" % self.table
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get_with_expiry(self, key: str) -> Tuple[Any, float]:
+        """``(value, expires)`` with ``expires`` as a wall-clock timestamp, or ``(_MISSING, 0)``."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires FROM %s WHERE key = ?" % self.table, (key,)
+            ).fetchone()
+            if row is None or row[1] <= time.time():
+                self.misses += 1
+                return _MISSING, 0.0
+            self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value, _ = self.get_with_expiry(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO %s (key, value, expires) VALUES (?, ?, ?)" % self.table,
+                (key, json.dumps(value, ensure_ascii=False), time.time() + ttl),
+            )
+
+    def purge_except(self, prefix: str) -> int:
+        """Delete every entry whose key does not start with ``prefix``."""
+        with self._lock:
+            return self._connection().execute(
+                "DELETE FROM %s WHERE substr(key, 1, ?) != ?" % self.table, (len(prefix), prefix)
+            ).rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._connection().execute("DELETE FROM %s WHERE expires <= ?" % self.table, (time.time(),)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses}
+
+
+class ByteLRUCache:
+    """Thread-safe LRU cache of ``bytes`` values holding at most ``maxbytes`` in total."""
+
+    def __init__(self, maxbytes: int = 64 << 20, ttl: float = 3600):
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                    self.nbytes -= len(entry[1])
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: bytes, ttl: Optional[float] = None) -> None:
+        if len(value) > self.maxbytes:
+            # Would evict everything else and still not fit
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= len(previous[1])
+            self._entries[key] = (expires, value)
+            self.nbytes += len(value)
+            while self.nbytes > self.maxbytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "bytes": self.nbytes,
+            "maxbytes": self.maxbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class FileCache:
+    """
+    ``bytes`` values stored one file per key under ``path``, at most
+    ``maxbytes`` in total. Files are written atomically (temporary file
+    and rename), so several worker processes can share the directory.
+    A file's mtime holds its expiry and its atime the last hit; when the
+    total grows past ``maxbytes``, expired and then least recently used
+    files are deleted down to 90% of it.
+    """
+
+    # Seconds after which the directory is rescanned to count other workers' writes
+    RESCAN_SECONDS = 60
+
+    def __init__(self, path: str, maxbytes: int = 1 << 30):
+        self.path = path
+        self.maxbytes = maxbytes
+        self._nbytes: Optional[int] = None
+        self._scanned = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _file(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest[:2], digest)
+
+    def get_with_expiry(self, key: str) -> Tuple[Any, float]:
+        """``(value, expires)`` with ``expires`` as a wall-clock timestamp, or ``(_MISSING, 0)``."""
+        file = self._file(key)
+        try:
+            with open(file, "rb") as f:
+                expires = os.fstat(f.fileno()).st_mtime
+                if expires > time.time():
+                    value = f.read()
+                    # Record the hit for LRU eviction, keeping the expiry
+                    os.utime(file, (time.time(), expires))
+                    self.hits += 1
+                    return value, expires
+        except OSError:
+            pass
+        self.misses += 1
+        return _MISSING, 0.0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value, _ = self.get_with_expiry(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.maxbytes:
+            return
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        temporary = "%s.%d.%d.tmp" % (file, os.getpid(), threading.get_ident())
+        try:
+            with open(temporary, "wb") as f:
+                f.write(value)
+            os.utime(temporary, (time.time(), time.time() + ttl))
+            os.replace(temporary, file)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+            raise
+        with self._lock:
+            if self._nbytes is not None:
+                self._nbytes += len(value)
+            if self._nbytes is None or self._nbytes > self.maxbytes or time.monotonic() - self._scanned > self.RESCAN_SECONDS:
+                self._evict()
+
+    def _scan(self) -> List[Tuple[float, float, int, str]]:
+        files = []
+        for directory in os.scandir(self.path) if os.path.isdir(self.path) else ():
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                with contextlib.suppress(OSError):
+                    stat = entry.stat()
+                    files.append((stat.st_atime, stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict(self) -> None:
+        files = self._scan()
+        total = sum(size for _, _, size, _ in files)
+        now = time.time()
+        # Expired files first, then the least recently used
+        files.sort(key=lambda item: (item[1] > now, item[0]))
+        for _, expires, size, file in files:
+            if expires > now and total <= self.maxbytes * 0.9:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(file)
+                total -= size
+                self.evictions += 1
+        self._nbytes, self._scanned = total, time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "bytes": self._nbytes,
+            "maxbytes": self.maxbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache:
+    """
+    Memory LRU in front of an optional :class:`SQLiteCache` (or
+    :class:`ByteLRUCache` in front of a :class:`FileCache`). Keys are
+    strings or tuples of strings; the disk tier stores tuples JSON-encoded.
+    """
+
+    def __init__(self, memory: Union[TTLCache, ByteLRUCache], disk: Optional[Union[SQLiteCache, FileCache]] = None):
+        self.memory = memory
+        self.disk = disk
+
+    @staticmethod
+    def _disk_key(key: Union[str, Tuple]) -> str:
+        return key if isinstance(key, str) else json.dumps(key)
+
+    def get(self, key: Union[str, Tuple], default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            try:
+                value, expires = self.disk.get_with_expiry(self._disk_key(key))
+            except (sqlite3.Error, OSError, ValueError) as e:
+                # A locked or corrupt disk tier is a miss, not an error
+                print("Warning: could not read cache entry from %s: %s" % (self.disk.path, e))
+                return default
+            if value is not _MISSING:
+                self.memory.set(key, value, ttl=expires - time.time())
+                return value
+        return default
+
+    def set(self, key: Union[str, Tuple], value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.memory.ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(self._disk_key(key), value, ttl)
+            except (sqlite3.Error, OSError) as e:
+                # The memory tier still serves this worker
+                print("Warning: could not write cache entry to %s: %s" % (self.disk.path, e))
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers with the same key.
+
+    The shared call is shielded: a caller that is cancelled stops waiting
+    but does not cancel the call for the others (its result can still be
+    cached). Exceptions are re-raised to every waiting caller.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def inflight(self, key: Hashable) -> Optional["asyncio.Future"]:
+        """The running call for ``key``, if any (await it through ``asyncio.shield``)."""
+        return self._inflight.get(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+def tiered_cache_from_env(prefix: str, maxsize: int = 10000, ttl: float = 86400, path: Optional[str] = None) -> TieredCache:
+    """
+    Build a :class:`TieredCache` configured by ``<PREFIX>_CACHE_SIZE``,
+    ``<PREFIX>_CACHE_TTL`` and ``<PREFIX>_CACHE_DB`` (SQLite path, default
+    ``path``; the disk tier is disabled when neither is set or the value
+    is empty).
+    """
+    maxsize = int(os.environ.get("%s_CACHE_SIZE" % prefix, maxsize))
+    ttl = float(os.environ.get("%s_CACHE_TTL" % prefix, ttl))
+    path = os.environ.get("%s_CACHE_DB" % prefix, path)
+    return TieredCache(TTLCache(maxsize=maxsize, ttl=ttl), SQLiteCache(path, table=prefix.lower()) if path else None)
+
+
+__all__ = [
+    "TTLCache",
+    "SQLiteCache",
+    "ByteLRUCache",
+    "FileCache",
+    "TieredCache",
+    "SingleFlight",
+    "tiered_cache_from_env",
+]
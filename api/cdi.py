@@ -1,15 +1,18 @@
 import json
-import requests
 import pandas as pd
 import rdflib
 import re
 import os
 import argparse
+from graphstore import OverlayGraph, get_vocabulary
+from sources import open_source
+from xdi import iter_xdi_events, Version, HeaderField, DataRow, ColumnLabels, XDIDataBlock, describe_data_block, CDI
 
 class CDI_DDI:
     def __init__(self, url=None, export_file=None, export_format=None, resources_dir="/app/resources", type=None):
-        self.url = url
-        self.g = rdflib.Graph()
+        # A location, or an opened sources.Source (e.g. content already downloaded)
+        self.url = url.location if hasattr(url, "location") else url
+        self.g = OverlayGraph()
         self.resources = {}
         self.resources_dir = resources_dir
         self.resources = self.load_resources(type)
@@ -25,77 +28,59 @@ class CDI_DDI:
         self.g.bind("name", self.name)
         self.g.bind("label", self.label)
         self.g.bind("bind", self.bind)
+        self.g.bind("cdi", CDI)
         self.export_file = export_file
         self.export_format = export_format
-        if url:
-            self.response = requests.get(url)
-        else:
-            self.response = None
+        # Local paths and file:// URIs are memory-mapped; URLs are only
+        # fetched once parse_cdi() iterates the lines
+        self.source = open_source(url) if url else None
         self.lastvariable = ""
         self.data = []
         self.datasets = {}
+        self.columns = {}
         self.navigator = None
-        self.session_triples = []
-        self.triples_memory = []
+        # What parse_cdi() saw, to tell an XDI file from anything else
+        self.xdi_version = None
+        self.header_fields = 0
+        self.data_rows = 0
+        self.session_triples = set()
+        self.triples_memory = set()
 
     def load_resources(self, type):
-        self.resources = {}
-        for file in os.listdir(self.resources_dir):
-            if type in file:
-                print(type, file)
-                if file.endswith(".jsonld"):
-                    self.resources[file.replace(".jsonld", "")] = self.g.parse(os.path.join(self.resources_dir, file), format="json-ld")
-                elif file.endswith(".ttl"):
-                    self.resources[file.replace(".ttl", "")] = self.g.parse(os.path.join(self.resources_dir, file), format="turtle")
+        # Parsed once per process and shared; self.g reads through to them
+        self.vocabulary = get_vocabulary(self.resources_dir, type)
+        self.resources = dict(self.vocabulary.graphs)
+        self.g.layer(*self.resources.values())
         return self.resources
 
     def empty_session_triples(self):
-        self.session_triples = []
+        self.session_triples = set()
         return self.session_triples
 
     def find_resource(self, resource_name, search_by="prefLabel"):
-        self.DEBUG = False
-        self.DEBUG_LEVEL = 0
-        self.triples = []
-        for resource in self.resources:
-            for triple in self.resources[resource]:
-                s, p, o = triple
-                print(triple)
-                if self.DEBUG_LEVEL == 1:
-                    print(s, p, o)
-                if search_by == "all":
-                    if p == rdflib.URIRef(self.skos.prefLabel) and o == rdflib.Literal(resource_name):
-                        if self.DEBUG:
-                            print("Search by prefLabel: " + s + " " + p + " " + resource_name) # + " " + self.resources[resource])
-                        if not triple in self.triples_memory:
-                            self.session_triples.append(triple)
-                            self.triples_memory.append(triple)
-                        self.find_resource(s, search_by="definition")
-                elif search_by == "subject":
-                    if rdflib.URIRef(s) == rdflib.URIRef(resource_name):
-                        if self.DEBUG:
-                            print("*** Search by subject: " + s + " " + p + " " + resource_name) # + " " + self.resources[resource])
-                        if not triple in self.triples_memory:
-                            self.session_triples.append(triple)
-                            self.triples_memory.append(triple)
-                elif search_by == "prefLabel":
-                    if p == rdflib.URIRef(self.skos.prefLabel) and o == rdflib.Literal(resource_name):
-                        if self.DEBUG:
-                            print("Search by prefLabel: " + s + " " + p + " " + resource_name) # + " " + self.resources[resource])
-                        self.find_resource(s, search_by="subject")
-                        self.session_triples.append(triple)
-                elif search_by == "definition":
-                    if p == rdflib.URIRef(self.skos.definition) and o == rdflib.Literal(resource_name):
-                        if self.DEBUG:
-                            print("Search by definition: " + s + " " + p + " " + resource_name) # + " " + self.resources[resource])
-                        self.session_triples.append(triple)
-                elif search_by == "altLabel":
-                    if p == rdflib.URIRef(self.skos.altLabel) and o == rdflib.Literal(resource_name):
-                        if self.DEBUG:
-                            print("Search by altLabel: " + s + " " + p + " " + resource_name) # + " " + self.resources[resource])
-                        self.session_triples.append(triple)
+        index = self.vocabulary.index
+        if search_by == "all":
+            for triple in index.lookup("prefLabel", resource_name):
+                self.session_triples.add(triple)
+                self.triples_memory.add(triple)
+                self.find_resource(triple[0], search_by="definition")
+        elif search_by == "subject":
+            triples = index.lookup("subject", resource_name)
+            self.session_triples.update(triples)
+            self.triples_memory.update(triples)
+        elif search_by == "prefLabel":
+            for triple in index.lookup("prefLabel", resource_name):
+                self.find_resource(triple[0], search_by="subject")
+                self.session_triples.add(triple)
+        elif search_by in ("definition", "altLabel"):
+            self.session_triples.update(index.lookup(search_by, resource_name))
         return self.session_triples
 
+    def annotate_field(self, node, field_name):
+        # Link a parsed header node to the vocabulary concept(s) with that label
+        for s, p, o in self.vocabulary.index.lookup("prefLabel", field_name):
+            self.g.add((node, self.skos.exactMatch, s))
+
     def check_compound_variable_name(self, compound_variable_name):
         if '.' in compound_variable_name:
             return True
@@ -116,59 +101,68 @@ class CDI_DDI:
         else:
             return None, value
 
+    def add_header_field(self, field_name, variable_value):
+        if field_name.startswith("Column.") and field_name[7:].isdigit():
+            self.columns[int(field_name[7:])] = variable_value
+        if '.' in field_name:
+            #Outer.value:  1.0
+            compound_variable_name_uri = field_name.replace(" ", "_").replace(":", "_")
+            variables = compound_variable_name_uri.split('.')
+            for variable_id in range(0,len(variables)-1):
+                variable_name = variables[variable_id]
+                variable_next = variables[variable_id+1]
+                self.g.add((rdflib.URIRef(self.name + variable_name), self.skos.prefLabel, rdflib.Literal(variable_name)))
+                self.g.add((rdflib.URIRef(self.name + variable_name), self.skos.broader, rdflib.URIRef(self.name + variable_next)))
+                blank = rdflib.BNode()
+                self.g.add((rdflib.URIRef(self.name + variable_name), rdflib.URIRef(self.name + variable_next), blank))
+                self.g.add((blank, rdflib.URIRef(self.skos.definition), rdflib.Literal(variable_value)))
+                self.navigator = blank
+            self.annotate_field(rdflib.URIRef(self.name + variables[0]), variables[0])
+            self.annotate_field(self.navigator, field_name)
+        else:
+            variable_name = field_name.replace(" ", "_")
+            self.g.add((rdflib.URIRef(self.name + variable_name), self.skos.prefLabel, rdflib.Literal(variable_value)))
+
+    def add_column_labels(self, labels):
+        for index, label in enumerate(labels, start=1):
+            self.columns.setdefault(index, label)
+
+    def add_data_row(self, values):
+        if self.navigator:
+            if not self.navigator in self.datasets:
+                self.datasets[self.navigator] = XDIDataBlock(self.columns)
+            self.datasets[self.navigator].append(values)
+            self.data_rows += 1
+
+    def add_data_blocks(self):
+        # One compact DataStore/PhysicalSegmentLayout reference per block
+        # instead of a literal per cell; the numbers stay in self.datasets
+        for index, (navigator, block) in enumerate(self.datasets.items(), start=1):
+            layout = describe_data_block(self.g, block, "%s#datablock-%d" % (self.url, index))
+            self.g.add((navigator, rdflib.URIRef(self.rdf.List), layout))
+
+    def iter_lines(self):
+        if self.source is None:
+            return iter(())
+        return self.source.iter_lines()
+
     def parse_cdi(self):
-        for line in self.response.text.split("\n"):
+        # Single streaming pass over the XDI body
+        for event in iter_xdi_events(self.iter_lines()):
+            if isinstance(event, Version):
+                self.xdi_version = event.text
             # Variables path
-            #print(line)
-            if self.check_variable_name(line):
-                compound_variable_name, variable_value = self.parse_structure(line)
-                if compound_variable_name and variable_value:
-                        compound_variable_name = compound_variable_name.group(1).strip('#  ') 
-                        variable_value = variable_value.group(1)
-                        if '.' in compound_variable_name:
-                            #Outer.value:  1.0
-                            compound_variable_name_uri = compound_variable_name.replace(" ", "_").replace(":", "_")
-                            variables = compound_variable_name_uri.split('.')
-                            variable_last = ''
-                            for variable_id in range(0,len(variables)-1):
-                                variable_name = variables[variable_id]
-                                variable_next = variables[variable_id+1]
-                                print("Compound: " + variable_name + '.' + variable_next + " = " + variable_value)
-                                self.g.add((rdflib.URIRef(self.name + variable_name), self.skos.prefLabel, rdflib.Literal(variable_name)))
-                                self.g.add((rdflib.URIRef(self.name + variable_name), self.skos.broader, rdflib.URIRef(self.name + variable_next)))
-                                variable_last = variable_next
-                                #self.g.add((rdflib.URIRef(self.name + variable_name), rdflib.URIRef(self.name + variable_next), rdflib.Literal(variable_value)))
-                                blank = rdflib.BNode()
-                                self.g.add((rdflib.URIRef(self.name + variable_name), rdflib.URIRef(self.name + variable_next), blank))
-                                self.g.add((blank, rdflib.URIRef(self.skos.definition), rdflib.Literal(variable_value)))
-                                self.navigator = blank
-                        else:
-                            variable_name = compound_variable_name.strip('#  ').replace(" ", "_")
-                            try:
-                                variable_value = variable_value.group(1)
-                                self.g.add((rdflib.URIRef(self.name + variable_name), self.skos.prefLabel, rdflib.Literal(variable_value)))
-                            except:
-                                pass
-                        try:
-                            lastvariable = variable_name
-                            g.add((rdflib.URIRef(name + variable_name), skos.prefLabel, rdflib.Literal(variable_value)))
-                            data.append({
-                                variable_name: variable_value
-                            })
-                        except:
-                            #print(line)
-                            pass
+            elif isinstance(event, HeaderField):
+                self.header_fields += 1
+                self.add_header_field(event.name, event.value)
             # Data path
-            else:
-                if self.navigator:
-                    if not self.lastvariable in self.datasets:
-                        self.datasets[self.navigator] = [line.strip()]
-                        for row in line.strip().split(' '):
-                            self.g.add((self.navigator, rdflib.URIRef(self.rdf.List), rdflib.Literal(row)))
-                    else:
-                        self.datasets[self.navigator].append(line.strip())
-                        for row in line.strip().split(' '):
-                            self.g.add((self.navigator, rdflib.URIRef(self.rdf.List), rdflib.Literal(row)))
+            elif isinstance(event, DataRow):
+                self.add_data_row(event.values)
+            elif isinstance(event, ColumnLabels):
+                self.add_column_labels(event.labels)
+        if self.xdi_version is None and not self.header_fields and not self.data_rows:
+            raise ValueError("not an XDI file: %s" % self.url)
+        self.add_data_blocks()
 
         # Convert the graph to JSON-LD format (optionally flattened)
         if self.export_file:
@@ -186,7 +180,4 @@ class CDI_DDI:
                         f.write(jsonld_str)
             else:
                 self.g.serialize(destination=self.export_file, format=self.export_format)
-
-        print(f"Graph exported to {self.export_file} in {self.export_format} format")
-        print(self.datasets)
         return self.g
@@ -0,0 +1,142 @@
+"""
+Content-addressed cache of generated ``/cdi`` documents.
+
+A document is stored under :func:`result_key`, a SHA-256 of everything
+it is generated from:
+
+- the source content (:func:`source_digest`): ``http(s)`` URLs such as
+  ``<siteUrl>/api/access/datafile/<fileid>`` are requested with the
+  ``ETag``/``Last-Modified`` of the previous download, so an unchanged
+  file costs one ``304``; a changed one is hashed while it streams into
+  a temporary file (in memory up to ``CDI_SOURCE_SPOOL_BYTES``), which
+  the parser then reads instead of downloading it again,
+- the request parameters (``format``, ``type``, ``datasetid``,
+  ``datasetversion``),
+- the resources fingerprint (name, mtime and size of every file in the
+  resources directories: vocabularies, mapping spreadsheet, contexts),
+- the cached schema.org export of the dataset
+  (:func:`schemaorg.cached_fingerprint`),
+- :data:`RESULT_VERSION`, to be bumped when the generated document
+  changes for the same inputs.
+
+The key doubles as the response ``ETag``. Documents are kept in a
+:class:`cache.ByteLRUCache` (``CDI_CACHE_MEMORY_BYTES``, default 64 MiB)
+in front of a :class:`cache.FileCache` shared by the workers
+(``CDI_CACHE_DIR``, default ``<tmp>/cdi-xas-cache/cdi``, empty disables
+it; ``CDI_CACHE_DISK_BYTES``, default 1 GiB) for ``CDI_CACHE_TTL``
+seconds (default 1 day). Source validators are kept like the other
+lookups (``CDI_SOURCE_CACHE_*``, default
+``<tmp>/cdi-xas-cache/sources.sqlite``).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from cache import ByteLRUCache, FileCache, TieredCache, tiered_cache_from_env
+from httpclient import get_session
+import schemaorg
+from sources import Source, SpooledSource, open_remote_source
+from xdi import DEFAULT_CHUNK_SIZE
+
+RESULT_VERSION = 1
+CACHE_TTL = float(os.environ.get("CDI_CACHE_TTL", 86400))
+# Seconds to wait for the conditional GET of a remote source
+SOURCE_TIMEOUT = float(os.environ.get("CDI_SOURCE_TIMEOUT", 60))
+# Downloaded sources larger than this are spooled to disk while hashed
+SOURCE_SPOOL_BYTES = int(os.environ.get("CDI_SOURCE_SPOOL_BYTES", 8 << 20))
+
+_disk_dir = os.environ.get("CDI_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cdi-xas-cache", "cdi"))
+result_cache = TieredCache(
+    ByteLRUCache(maxbytes=int(os.environ.get("CDI_CACHE_MEMORY_BYTES", 64 << 20)), ttl=CACHE_TTL),
+    FileCache(_disk_dir, maxbytes=int(os.environ.get("CDI_CACHE_DISK_BYTES", 1 << 30))) if _disk_dir else None,
+)
+# URL -> {"etag", "last_modified", "sha256"} of its last download
+source_validators = tiered_cache_from_env(
+    "CDI_SOURCE",
+    maxsize=10000,
+    ttl=30 * 86400,
+    path=os.path.join(tempfile.gettempdir(), "cdi-xas-cache", "sources.sqlite"),
+)
+
+
+def source_digest(url: str) -> Tuple[str, Optional[Source]]:
+    """
+    SHA-256 of the content at the ``http(s)`` ``url`` and, when it had to
+    be downloaded for that, a :class:`sources.SpooledSource` to parse
+    instead of fetching it again (else None; close it when done). Raises
+    ``ValueError`` for any other location and
+    ``requests.RequestException`` when the download fails.
+    """
+    open_remote_source(url)
+    entry = source_validators.get(url)
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    with get_session().get(url, headers=headers, timeout=SOURCE_TIMEOUT, stream=True) as response:
+        if entry is not None and response.status_code == 304:
+            return entry["sha256"], None
+        response.raise_for_status()
+        digest = hashlib.sha256()
+        spool = tempfile.SpooledTemporaryFile(max_size=SOURCE_SPOOL_BYTES)
+        try:
+            for chunk in response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE):
+                digest.update(chunk)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        validators = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if any(validators):
+        source_validators.set(url, {"etag": validators[0], "last_modified": validators[1], "sha256": digest.hexdigest()})
+    return digest.hexdigest(), SpooledSource(url, spool)
+
+
+def resources_fingerprint(directories: Iterable[str]) -> str:
+    """Digest of the name, mtime and size of every file in ``directories``."""
+    signature = []
+    for directory in sorted(set(os.path.abspath(d) for d in directories)):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                signature.append([directory, entry.name, stat.st_mtime_ns, stat.st_size])
+    return hashlib.sha256(json.dumps(signature).encode("utf-8")).hexdigest()
+
+
+def result_key(digest: str, params: Dict[str, Any], resources_dirs: Iterable[str], dataset: Optional[schemaorg.DatasetKey]) -> str:
+    """
+    Cache key (and ETag) of the document generated from content
+    ``digest`` with ``params``, the files in ``resources_dirs`` and the
+    cached schema.org export of ``dataset``.
+    """
+    parts = {
+        "version": RESULT_VERSION,
+        "source": digest,
+        "params": params,
+        "resources": resources_fingerprint(resources_dirs),
+        "schemaorg": schemaorg.cached_fingerprint(dataset) if dataset is not None else None,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def stats() -> Dict[str, Any]:
+    return {"results": result_cache.stats(), "sources": source_validators.stats()}
+
+
+__all__ = [
+    "RESULT_VERSION",
+    "result_cache",
+    "source_digest",
+    "resources_fingerprint",
+    "result_key",
+    "stats",
+]
@@ -1,12 +1,75 @@
 import re
+import threading
+from functools import lru_cache
 import pandas as pd
 import rdflib
 from rdflib import Literal
+from rdflib.graph import ReadOnlyGraphAggregate
+from rdflib.namespace import RDF, SKOS, XSD
+from rdflib.plugins.sparql import prepareQuery
+from graphindex import IndexCache, SubstringIndex, TermIndex
+from graphstore import OverlayGraph, load_graph_snapshot
+
+QUERY_NAMESPACES = {
+    "xdi": rdflib.Namespace("http://www.w3.org/ns/xdi/core#"),
+    "xsd": XSD,
+    "rdf": RDF,
+    "skos": SKOS,
+}
+
+@lru_cache(maxsize=64)
+def related_objects_query(predicate):
+    # Compiled once per predicate expression; the subject is bound at run time
+    return prepareQuery(
+        "SELECT ?object WHERE { ?subject %s ?object . }" % predicate,
+        initNs=QUERY_NAMESPACES,
+    )
+
+def resolve_predicate(predicate):
+    if predicate.startswith("<") and predicate.endswith(">"):
+        return rdflib.URIRef(predicate[1:-1])
+    prefix, sep, local = predicate.partition(":")
+    if sep and prefix in QUERY_NAMESPACES and re.fullmatch(r"[\w.-]+", local):
+        return QUERY_NAMESPACES[prefix][local]
+    return None
+
+class DataLearningBase:
+    """
+    Per-worker state shared by every request: the full DDI-CDI graph and
+    the parsed default configuration graph, both read-only. Requests get a
+    :class:`DataLearning` overlay from :meth:`overlay`.
+    """
+    def __init__(self, config_path, data_path, format="json-ld"):
+        self.config_path = config_path
+        self.data_path = data_path
+        self.format = format
+        self.fullgraph = load_graph_snapshot(config_path + "/ddi-cdi-full-graph.ttl")
+        graph = rdflib.Graph()
+        graph.parse(data_path, format=format)
+        self.graph = ReadOnlyGraphAggregate([graph])
+        self.indexes = IndexCache()
+
+    def overlay(self, data_path=None):
+        # Lightweight per-request view: g and cdigraph write privately and
+        # read through to the shared graphs
+        return DataLearning(self.config_path, data_path or self.data_path, format=self.format, base=self)
+
+_bases = {}
+_bases_lock = threading.Lock()
+
+def get_data_learning_base(config_path, data_path, format="json-ld"):
+    key = (config_path, data_path, format)
+    with _bases_lock:
+        if key not in _bases:
+            _bases[key] = DataLearningBase(config_path, data_path, format=format)
+        return _bases[key]
 
 class DataLearning:
-    def __init__(self, config_path, data_path, format="turtle"):
+    def __init__(self, config_path, data_path, format="turtle", base=None):
         self.data_path = data_path
-        self.g = rdflib.Graph()
+        self.base = base
+        self.g = OverlayGraph()
+        self.indexes = IndexCache()
         self.nodes = []
         self.path = "file://" + config_path
         self.set_local_path(config_path)
@@ -19,7 +82,6 @@ class DataLearning:
         self.full_graph_path = config_path + "/ddi-cdi-full-graph.ttl"
         self.g.bind("DDICDIMODELS", self.path + "xdi_example_ss.jsonld")
         self.cdigraph = rdflib.Graph()
-        self.fullgraph = rdflib.Graph()
         self.load_full_graph()
         self.cdigraph.bind("DDICDIMODELS", self.path + "xdi_example_ss.jsonld")
         self.cdigraph.context = {
@@ -38,31 +100,27 @@ class DataLearning:
             return self.cdiuri + uri
     
     def load_full_graph(self, format="turtle"):
-        self.fullgraph.parse(self.full_graph_path, format=format)
+        # Shared, read-only and loaded from a binary snapshot when available
+        if self.base is not None:
+            self.fullgraph = self.base.fullgraph
+        else:
+            self.fullgraph = load_graph_snapshot(self.full_graph_path, format=format)
 
     def load_data(self, format="json-ld"):
-        self.g.parse(self.data_path, format=format)
+        if self.base is not None and self.base.data_path == self.data_path:
+            # Default configuration is already parsed by the shared base
+            self.g.layer(self.base.graph)
+        else:
+            self.g.parse(self.data_path, format=format)
 
     def get_data(self):
         return self.g
 
     def get_type(self, subject, graph=None):
-        subject = f"<{self.checkURI(subject)}>"
-        query = f"""
-            PREFIX xdi: <http://www.w3.org/ns/xdi/core#>
-            PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-            SELECT ?object WHERE {{
-                {subject} rdf:type ?object .
-            }}
-        """
-        result = []
-        #print(query)
-        for s in graph.query(query):
-            result.append(str(s[0]))
-        if not result:
-            return None
-        return result[0]
+        subject = rdflib.URIRef(self.checkURI(subject))
+        for object in graph.objects(subject, RDF.type):
+            return str(object)
+        return None
 
     def set_local_path(self, path):
         self.path = "file://" + path
@@ -79,57 +137,46 @@ class DataLearning:
         return self.g.serialize(format=format)
 
     def lookup_subject(self, subject):
-        subject = f"<{subject}>"
-        query = f"""
-            PREFIX xdi: <http://www.w3.org/ns/xdi/core#>
-            PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-            SELECT ?subject ?predicate ?object WHERE {{
-                {subject} ?predicate ?object .
-            }}
-        """ 
-        print(query)
-        for s in self.g.query(query):
-            print(s)
+        result = []
+        for predicate, object in self.g.predicate_objects(rdflib.URIRef(subject)):
+            print(subject, predicate, object)
+            result.append([str(predicate), str(object)])
+        return result
 
     def get_related_triples(self, graph, subject, predicate="skos:narrower"):
-        subject = f"<{self.checkURI(subject)}>"
+        subject = rdflib.URIRef(self.checkURI(subject))
         self.nodes = []
-        query = f"""
-            PREFIX xdi: <http://www.w3.org/ns/xdi/core#>
-            PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-            PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-            SELECT ?object ?predicate WHERE {{
-                {subject} {predicate} ?object .
-            }}
-        """
-        #print(query)
+        uri = resolve_predicate(predicate)
+        if uri is not None:
+            objects = graph.objects(subject, uri)
+        else:
+            # Property paths and other expressions go through a cached prepared query
+            objects = (row[0] for row in graph.query(related_objects_query(predicate), initBindings={"subject": subject}))
         result = []
-        for s in graph.query(query):
-            result.append(str(s[0]))
-            self.nodes.append(str(s[0]))
-            print("[DEBUG] ", s[0])
+        for object in objects:
+            result.append(str(object))
+            self.nodes.append(str(object))
+            print("[DEBUG] ", object)
         return result
 
+    def get_index(self, index_class, graph):
+        # Indexes over the shared graphs (including a pure read-through
+        # overlay of the base configuration) are built once per worker
+        if self.base is not None:
+            if graph is self.base.fullgraph:
+                return self.base.indexes.get(index_class, graph)
+            if graph is self.g and self.g.bases == [self.base.graph] and not self.g.own_len():
+                return self.base.indexes.get(index_class, self.base.graph)
+        return self.indexes.get(index_class, graph)
+
     def configurate_triples(self, value, graph=None):
-        self.DEBUG = True
-        if self.DEBUG:
-            print("Configurate triples for: ", value)
-        for triple in graph.triples((None, None, None)):
-            s, p, o = triple
-            if value.lower() == str(s).lower():
-                if self.DEBUG:
-                    print("\nS: ", triple)
-                self.cdigraph.add(triple)
-            if value.lower() == str(p).lower():
-                if self.DEBUG:
-                    print("\tP: ", triple)
-                self.cdigraph.add(triple)
-            if value.lower() == str(o).lower():
-                if self.DEBUG:
-                    print("\tO: ", triple)
-                self.cdigraph.add(triple)
+        # value may be a single IRI or a batch of IRIs; one index lookup each
+        triples = self.get_index(TermIndex, graph).lookup_many(value)
+        print("Configurate triples for: ", value, len(triples))
+        for triple in triples:
+            self.cdigraph.add(triple)
+        return triples
 
-    
     def lookup_predicate(self, predicate):
         return self.g.predicates(predicate)
     
@@ -138,44 +185,34 @@ class DataLearning:
     
     def add_permanent_schema(self, schema):
         if schema == 'dataset':
-            field = "InstanceVariable"
-            field = "LogicalRecord_has_InstanceVariable"
-            #field = "logical_record"
-            x = self.configurate_triples(self.cdiuri + field, self.g)
-            field = "LogicalRecord_organizes_DataSet"
-            x = self.configurate_triples(self.cdiuri + field, self.g)
-            field = "has_DataStructureComponent"
-            x = self.configurate_triples(self.cdiuri + field, self.g)
-            field = "DataStructureComponent_isDefinedBy_RepresentedVariable"
-            x = self.configurate_triples(self.cdiuri + field, self.g)
-            field = "logicalRecord-wds"
-            x = self.configurate_triples(self.cdiuri + field, self.g)
+            fields = [self.cdiuri + field for field in (
+                "LogicalRecord_has_InstanceVariable",
+                "LogicalRecord_organizes_DataSet",
+                "has_DataStructureComponent",
+                "DataStructureComponent_isDefinedBy_RepresentedVariable",
+                "logicalRecord-wds",
+                "SegmentByText",
+            )]
             field = "SegmentByText"
-            x = self.configurate_triples(self.cdiuri + field, self.g)
             compoundfields = self.get_related_triples(self.fullgraph, self.cdiuri + field)
             for field in compoundfields:
                 x = self.get_related_triples(self.fullgraph, field)
                 print("[COMPOUND DEBUG 2] x: y:", x, field)
                 for field in x:
-                    #x = self.configurate_triples(field, self.g)
                     y = self.get_related_triples(self.fullgraph, field)
             print("[COMPOUND DEBUG] fields: ", compoundfields)
 
             # Local path
-            #localpath = "file:///home/tikhonov/projects/computer-eyes/resources/xdi_example_ss.jsonld" #xdi_example_wds.jsonld#"
-            field = "physicalSegmentLayout"
-            x = self.configurate_triples(self.permauri + '#' + field, self.g)
-            field = "ValueMapping"
-            x = self.configurate_triples(self.permauri + '#' + field, self.g)
-            field = "DataStore"
-            x = self.configurate_triples(self.permauri + '#' + field, self.g)
-            field = "wideDataSet"
-            x = self.configurate_triples(self.permauri + '#' + field, self.g)
-            field = "wideDataStructure"
-            x = self.configurate_triples(self.permauri + '#' + field, self.g)
-            field = "physicalSegmentLayout-wds"
-            x = self.configurate_triples(self.localpath + '#' + field, self.g)
-            #print(data.cdigraph.serialize(format="turtle"))
+            fields += [self.permauri + '#' + field for field in (
+                "physicalSegmentLayout",
+                "ValueMapping",
+                "DataStore",
+                "wideDataSet",
+                "wideDataStructure",
+            )]
+            fields.append(self.localpath + '#' + "physicalSegmentLayout-wds")
+            # Single batched lookup instead of one full graph scan per field
+            self.configurate_triples(fields, self.g)
         return self.cdigraph
 
     def export(self, format="turtle"):
@@ -187,19 +224,11 @@ class DataLearning:
             dataexport.append(line)
         return "\n".join(dataexport)
 
-    def triple_by_triple(self, graph=None, search=None):
-        triples = []
-        for s, p, o in graph.triples((None, None, None)):
-            if not search:
-                triples.append(f"{s} {p} {o}")
-                continue
-            else:
-                searchquery = self.checkURI(search)
-                if searchquery.lower() in str(s).lower():
-                    triples.append(f"{s} {p} {o}")
-                if searchquery.lower() in str(p).lower():
-                    triples.append(f"{s} {p} {o}")
-                if searchquery.lower() in str(o).lower():
-                    triples.append(f"{s} {p} {o}")
+    def search_triples(self, graph=None, search=None, limit=None, offset=0):
+        triples = self.get_index(SubstringIndex, graph).search(self.checkURI(search) if search else None)
+        end = None if limit is None else offset + limit
+        return len(triples), [f"{s} {p} {o}" for s, p, o in triples[offset:end]]
+
+    def triple_by_triple(self, graph=None, search=None, limit=None, offset=0):
+        total, triples = self.search_triples(graph, search, limit, offset)
         return triples
-    
\ No newline at end of file
@@ -1,11 +1,13 @@
 import re
 import rdflib
-import requests
 from rdflib.namespace import SKOS, RDF
+from sources import open_source
+from xdi import iter_xdi_events, HeaderField, DataRow, ColumnLabels, XDIDataBlock, describe_data_block
 
 class CDI_DDI:
     def __init__(self, url=None, export_file=None, export_format=None, resources_dir="./resources", type=None):
-        self.url = url
+        # A location, or an opened sources.Source
+        self.url = url.location if hasattr(url, "location") else url
         self.export_file = export_file
         self.export_format = export_format
         self.resources_dir = resources_dir
@@ -19,9 +21,10 @@ class CDI_DDI:
         self.g.bind("cdi", self.name)
         self.instance = "instanceVariable"
         self.datasets = {}
+        self.columns = {}
         self.navigator = None
         self.lastvariable = None
-        self.response = requests.get(url)
+        self.source = open_source(url) if url else None
 
     def get_full_variable_name(self, variable_name):
         return self.name +  self.instance + '-' + variable_name
@@ -58,59 +61,61 @@ class CDI_DDI:
         else:
             return None, value
 
+    def add_header_field(self, field_name, variable_value):
+        if field_name.startswith("Column.") and field_name[7:].isdigit():
+            self.columns[int(field_name[7:])] = variable_value
+        if '.' in field_name:
+            #Outer.value:  1.0
+            compound_variable_name_uri = field_name.replace(" ", "_").replace(":", "_")
+            variables = compound_variable_name_uri.split('.')
+            for variable_id in range(0,len(variables)-1):
+                variable_name = variables[variable_id]
+                variable_next = variables[variable_id+1]
+                print("Compound: " + variable_name + '.' + variable_next + " = " + variable_value)
+                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), self.skos.prefLabel, rdflib.Literal(variable_name)))
+                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), self.skos.broader, rdflib.URIRef(self.get_full_variable_name(variable_next))))
+                blank = rdflib.BNode()
+                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), rdflib.URIRef(self.get_full_variable_name(variable_next)), blank))
+                self.g.add((blank, rdflib.URIRef(self.skos.definition), rdflib.Literal(variable_value)))
+                self.navigator = blank
+        else:
+            variable_name = field_name.replace(" ", "_")
+            self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), self.skos.prefLabel, rdflib.Literal(variable_value)))
+
+    def add_column_labels(self, labels):
+        for index, label in enumerate(labels, start=1):
+            self.columns.setdefault(index, label)
+
+    def add_data_row(self, values):
+        if self.navigator:
+            if not self.navigator in self.datasets:
+                self.datasets[self.navigator] = XDIDataBlock(self.columns)
+            self.datasets[self.navigator].append(values)
+
+    def add_data_blocks(self):
+        # One compact DataStore/PhysicalSegmentLayout reference per block
+        # instead of a literal per cell; the numbers stay in self.datasets
+        for index, (navigator, block) in enumerate(self.datasets.items(), start=1):
+            layout = describe_data_block(self.g, block, "%s#datablock-%d" % (self.url, index))
+            self.g.add((navigator, rdflib.URIRef(self.rdf.List), layout))
+
+    def iter_lines(self):
+        if self.source is None:
+            return iter(())
+        return self.source.iter_lines()
+
     def parse_cdi(self):
-        for line in self.response.text.split("\n"):
+        # Single streaming pass over the XDI body
+        for event in iter_xdi_events(self.iter_lines()):
             # Variables path
-            #print(line)
-            if self.check_variable_name(line):
-                compound_variable_name, variable_value = self.parse_structure(line)
-                if compound_variable_name and variable_value:
-                        compound_variable_name = compound_variable_name.group(1).strip('#  ')
-                        variable_value = variable_value.group(1)
-                        if '.' in compound_variable_name:
-                            #Outer.value:  1.0
-                            compound_variable_name_uri = compound_variable_name.replace(" ", "_").replace(":", "_")
-                            variables = compound_variable_name_uri.split('.')
-                            variable_last = ''
-                            for variable_id in range(0,len(variables)-1):
-                                variable_name = variables[variable_id]
-                                variable_next = variables[variable_id+1]
-                                print("Compound: " + variable_name + '.' + variable_next + " = " + variable_value)
-                                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), self.skos.prefLabel, rdflib.Literal(variable_name)))
-                                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), self.skos.broader, rdflib.URIRef(self.get_full_variable_name(variable_next))))
-                                variable_last = variable_next
-                                #self.g.add((rdflib.URIRef(self.name + variable_name), rdflib.URIRef(self.name + variable_next), rdflib.Literal(variable_value)))
-                                blank = rdflib.BNode()
-                                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), rdflib.URIRef(self.get_full_variable_name(variable_next)), blank))
-                                self.g.add((blank, rdflib.URIRef(self.skos.definition), rdflib.Literal(variable_value)))
-                                self.navigator = blank
-                        else:
-                            variable_name = compound_variable_name.strip('#  ').replace(" ", "_")
-                            try:
-                                variable_value = variable_value.group(1)
-                                self.g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), self.skos.prefLabel, rdflib.Literal(variable_value)))
-                            except:
-                                pass
-                        try:
-                            lastvariable = variable_name
-                            g.add((rdflib.URIRef(self.get_full_variable_name(variable_name)), skos.prefLabel, rdflib.Literal(variable_value)))
-                            data.append({
-                                variable_name: variable_value
-                            })
-                        except:
-                            #print(line)
-                            pass
+            if isinstance(event, HeaderField):
+                self.add_header_field(event.name, event.value)
             # Data path
-            else:
-                if self.navigator:
-                    if not self.lastvariable in self.datasets:
-                        self.datasets[self.navigator] = [line.strip()]
-                        for row in line.strip().split(' '):
-                            self.g.add((self.navigator, rdflib.URIRef(self.rdf.List), rdflib.Literal(row)))
-                    else:
-                        self.datasets[self.navigator].append(line.strip())
-                        for row in line.strip().split(' '):
-                            self.g.add((self.navigator, rdflib.URIRef(self.rdf.List), rdflib.Literal(row)))
+            elif isinstance(event, DataRow):
+                self.add_data_row(event.values)
+            elif isinstance(event, ColumnLabels):
+                self.add_column_labels(event.labels)
+        self.add_data_blocks()
         return self.g
 
 #url = "https://raw.githubusercontent.com/XraySpectroscopy/XAS-Data-Interchange/refs/heads/master/data/nonxafs_2d.xdi"
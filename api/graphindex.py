@@ -0,0 +1,174 @@
+"""
+In-memory lookup indexes over rdflib graphs.
+
+Indexes are built once per (shared, read-only) graph and turn the
+full-graph scans used for label and term lookups into dictionary hits.
+:class:`LabelIndex` label keys are normalised with :func:`normalize_key`
+(Unicode NFKC, case-folded, whitespace collapsed) and subject IRIs are
+matched exactly; :class:`TermIndex`
+keys are the lowered term strings. :class:`SubstringIndex` answers
+case-insensitive substring queries through a trigram index.
+"""
+
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+import rdflib
+from rdflib.namespace import SKOS
+
+Triple = Tuple[rdflib.term.Node, rdflib.term.Node, rdflib.term.Node]
+
+LABEL_PREDICATES = {
+    "prefLabel": SKOS.prefLabel,
+    "altLabel": SKOS.altLabel,
+    "definition": SKOS.definition,
+}
+
+_EMPTY: FrozenSet[Triple] = frozenset()
+
+
+def normalize_key(value) -> str:
+    return " ".join(unicodedata.normalize("NFKC", str(value)).casefold().split())
+
+
+class LabelIndex:
+    """
+    SKOS label index: ``prefLabel``, ``altLabel`` and ``definition``
+    values (normalised), plus ``subject`` IRIs (exact strings), each
+    mapped to the set of matching triples.
+    """
+
+    fields = tuple(LABEL_PREDICATES) + ("subject",)
+
+    def __init__(self, graphs: Iterable[rdflib.Graph]):
+        index: Dict[str, Dict[str, set]] = {field: defaultdict(set) for field in self.fields}
+        predicates = {predicate: field for field, predicate in LABEL_PREDICATES.items()}
+        for graph in graphs:
+            for triple in graph:
+                s, p, o = triple
+                index["subject"][str(s)].add(triple)
+                field = predicates.get(p)
+                if field:
+                    index[field][normalize_key(o)].add(triple)
+        self._index = {
+            field: {key: frozenset(triples) for key, triples in keys.items()}
+            for field, keys in index.items()
+        }
+
+    def lookup(self, field: str, value) -> FrozenSet[Triple]:
+        """Triples whose ``field`` (``prefLabel``, ``altLabel``, ``definition`` or ``subject``) matches ``value``."""
+        key = str(value) if field == "subject" else normalize_key(value)
+        return self._index[field].get(key, _EMPTY)
+
+
+class TermIndex:
+    """
+    Case-insensitive term index: every lowered IRI/literal string maps to
+    the triples where it occurs in subject, predicate or object position.
+    Matching is exact (after ``str(term).lower()``), not normalised.
+    """
+
+    def __init__(self, graph: rdflib.Graph):
+        index: Dict[str, set] = defaultdict(set)
+        for triple in graph:
+            for term in set(triple):
+                index[str(term).lower()].add(triple)
+        self._index = {key: frozenset(triples) for key, triples in index.items()}
+
+    def lookup(self, value) -> FrozenSet[Triple]:
+        return self._index.get(str(value).lower(), _EMPTY)
+
+    def lookup_many(self, values: Union[str, Iterable[str]]) -> Set[Triple]:
+        """Union of :meth:`lookup` over ``values`` (a single value is accepted too)."""
+        if isinstance(values, str):
+            values = [values]
+        triples: Set[Triple] = set()
+        for value in values:
+            triples.update(self.lookup(value))
+        return triples
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class SubstringIndex:
+    """
+    Case-insensitive substring search over the term strings of a graph.
+
+    Every distinct lowered term is broken into ``n``-grams; a query is
+    answered by intersecting the posting sets of its ``n``-grams,
+    verifying the surviving terms with ``in`` and returning the triples
+    that contain them. Queries shorter than ``n`` fall back to a scan of
+    the distinct terms (not of the triples).
+    """
+
+    def __init__(self, graph: rdflib.Graph, n: int = 3):
+        self.n = n
+        self.triples: List[Triple] = sorted(graph, key=lambda t: (str(t[0]), str(t[1]), str(t[2])))
+        self._rank = {triple: rank for rank, triple in enumerate(self.triples)}
+        term_triples: Dict[str, set] = defaultdict(set)
+        for triple in self.triples:
+            for term in set(triple):
+                term_triples[str(term).lower()].add(triple)
+        self.terms: List[str] = list(term_triples)
+        self._term_triples = [frozenset(term_triples[term]) for term in self.terms]
+        grams: Dict[str, set] = defaultdict(set)
+        for term_id, term in enumerate(self.terms):
+            for start in range(len(term) - n + 1):
+                grams[term[start:start + n]].add(term_id)
+        self._grams = {gram: frozenset(ids) for gram, ids in grams.items()}
+
+    def _matching_terms(self, query: str) -> Iterable[int]:
+        if len(query) < self.n:
+            return (term_id for term_id, term in enumerate(self.terms) if query in term)
+        postings = []
+        for start in range(len(query) - self.n + 1):
+            ids = self._grams.get(query[start:start + self.n])
+            if not ids:
+                return ()
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return (term_id for term_id in candidates if query in self.terms[term_id])
+
+    def search(self, query: Optional[str]) -> List[Triple]:
+        """Deduplicated triples with ``query`` in any position, in stable graph order."""
+        if not query:
+            return self.triples
+        triples: Set[Triple] = set()
+        for term_id in self._matching_terms(query.lower()):
+            triples.update(self._term_triples[term_id])
+        return sorted(triples, key=self._rank.__getitem__)
+
+
+class IndexCache:
+    """Per-graph cache of index objects, keyed by index class and graph identity."""
+
+    def __init__(self):
+        self._indexes: Dict[Tuple[type, int], Tuple[rdflib.Graph, object]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, index_class, graph: rdflib.Graph):
+        key = (index_class, id(graph))
+        entry = self._indexes.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._indexes.get(key)
+                if entry is None:
+                    # Keep a reference to the graph so its id cannot be reused
+                    entry = (graph, index_class(graph))
+                    self._indexes[key] = entry
+        return entry[1]
+
+
+__all__ = [
+    "Triple",
+    "LABEL_PREDICATES",
+    "normalize_key",
+    "LabelIndex",
+    "TermIndex",
+    "SubstringIndex",
+    "IndexCache",
+]
@@ -0,0 +1,282 @@
+"""
+Process-wide caches of parsed RDF graphs.
+
+Large static graphs such as ``resources/ddi-cdi-full-graph.ttl`` are
+loaded through :func:`load_graph_snapshot`: the first load writes a
+compact binary term table next to a hash of the source file (in a
+``.snapshots`` directory beside it, or ``GRAPH_SNAPSHOT_DIR``), later
+processes load that table instead of re-running the Turtle parser, and
+all callers in one process share the same graph object.
+
+Vocabulary resources (``resources/*<type>*.jsonld`` / ``.ttl``) are
+parsed once per process and shared read-only between requests. Request
+graphs are :class:`OverlayGraph` instances: their own writes go to a
+private store while reads fall through to the shared graphs, so no
+triples are copied per request.
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import rdflib
+from rdflib.graph import ReadOnlyGraphAggregate
+from rdflib.paths import Path
+
+from graphindex import LabelIndex
+
+RESOURCE_FORMATS = {
+    ".jsonld": "json-ld",
+    ".ttl": "turtle",
+}
+# Default: a ``.snapshots`` directory next to the source graph
+SNAPSHOT_DIR = os.environ.get("GRAPH_SNAPSHOT_DIR") or None
+# marshal output is only stable within one Python version
+SNAPSHOT_VERSION = "1-py%d%d" % sys.version_info[:2]
+
+
+class OverlayGraph(rdflib.Graph):
+    """
+    Graph layered on top of shared read-only base graphs.
+
+    ``add``/``remove`` only touch this graph's own store. ``triples`` (and
+    therefore iteration, ``query``, ``serialize`` …) yields the private
+    triples followed by the base triples, each triple at most once.
+    """
+
+    def __init__(self, bases: Iterable[rdflib.Graph] = (), **kwargs):
+        super().__init__(**kwargs)
+        self.bases: List[rdflib.Graph] = []
+        self.layer(*bases)
+
+    def layer(self, *bases: rdflib.Graph) -> "OverlayGraph":
+        """Add base graphs to read through to; their prefixes are bound without overriding ours."""
+        for base in bases:
+            self.bases.append(base)
+            for prefix, namespace in base.namespaces():
+                self.bind(prefix, namespace, override=False)
+        return self
+
+    def _own_triples(self, triple):
+        for t, _ in self.store.triples(triple, context=self):
+            yield t
+
+    def triples(self, triple):
+        s, p, o = triple
+        if isinstance(p, Path):
+            for _s, _o in p.eval(self, s, o):
+                yield _s, p, _o
+            return
+        yield from self._own_triples(triple)
+        for index, base in enumerate(self.bases):
+            for t in base.triples(triple):
+                if any(True for _ in self._own_triples(t)):
+                    continue
+                if any(t in earlier for earlier in self.bases[:index]):
+                    continue
+                yield t
+
+    def __len__(self) -> int:
+        if not self.bases:
+            return super().__len__()
+        return sum(1 for _ in self.triples((None, None, None)))
+
+    def own_len(self) -> int:
+        """Number of triples written to this overlay only."""
+        return super().__len__()
+
+
+class Vocabulary:
+    """Immutable set of parsed resource graphs for one ``(resources_dir, type)``."""
+
+    def __init__(self, resources_dir: str, type: str, signature: Tuple):
+        self.resources_dir = resources_dir
+        self.type = type
+        self.signature = signature
+        self.graphs: Dict[str, rdflib.Graph] = {}
+        for file, _, _ in signature:
+            name, ext = os.path.splitext(file)
+            graph = rdflib.Graph()
+            graph.parse(os.path.join(resources_dir, file), format=RESOURCE_FORMATS[ext])
+            # Wrap so accidental writes from request code raise instead of leaking
+            self.graphs[name] = ReadOnlyGraphAggregate([graph])
+        self._index: Optional[LabelIndex] = None
+
+    @property
+    def index(self) -> LabelIndex:
+        """Label index over all graphs, built on first use."""
+        if self._index is None:
+            self._index = LabelIndex(self.graphs.values())
+        return self._index
+
+
+_vocabularies: Dict[Tuple[str, Optional[str]], Vocabulary] = {}
+_vocabularies_lock = threading.Lock()
+
+
+def resource_signature(resources_dir: str, type: Optional[str]) -> Tuple:
+    """``(file, mtime_ns, size)`` for every resource file matching ``type``."""
+    if not type:
+        return ()
+    signature = []
+    for file in sorted(os.listdir(resources_dir)):
+        if type in file and os.path.splitext(file)[1] in RESOURCE_FORMATS:
+            stat = os.stat(os.path.join(resources_dir, file))
+            signature.append((file, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def get_vocabulary(resources_dir: str, type: Optional[str]) -> Vocabulary:
+    """
+    Return the shared :class:`Vocabulary` for ``(resources_dir, type)``,
+    re-parsing only when a matching file was added, removed or modified.
+    """
+    key = (os.path.abspath(resources_dir), type)
+    signature = resource_signature(key[0], type)
+    vocabulary = _vocabularies.get(key)
+    if vocabulary is not None and vocabulary.signature == signature:
+        return vocabulary
+    with _vocabularies_lock:
+        vocabulary = _vocabularies.get(key)
+        if vocabulary is None or vocabulary.signature != signature:
+            vocabulary = Vocabulary(key[0], type, signature)
+            _vocabularies[key] = vocabulary
+    return vocabulary
+
+
+def clear_vocabularies() -> None:
+    with _vocabularies_lock:
+        _vocabularies.clear()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode_term(term) -> Tuple:
+    if isinstance(term, rdflib.URIRef):
+        return (0, str(term))
+    if isinstance(term, rdflib.BNode):
+        return (1, str(term))
+    return (2, str(term), term.language, str(term.datatype) if term.datatype else None)
+
+
+def _decode_term(row: Tuple):
+    if row[0] == 0:
+        return rdflib.URIRef(row[1])
+    if row[0] == 1:
+        return rdflib.BNode(row[1])
+    return rdflib.Literal(row[1], lang=row[2], datatype=row[3])
+
+
+def write_graph_snapshot(graph: rdflib.Graph, snapshot_path: str, digest: str) -> None:
+    """Write ``graph`` as a marshalled term table plus integer triple table."""
+    terms: Dict = {}
+    triples = []
+    for triple in graph:
+        triples.append(tuple(terms.setdefault(term, len(terms)) for term in triple))
+    table = {
+        "version": SNAPSHOT_VERSION,
+        "sha256": digest,
+        "namespaces": [(prefix, str(namespace)) for prefix, namespace in graph.namespaces()],
+        "terms": [_encode_term(term) for term in terms],
+        "triples": triples,
+    }
+    os.makedirs(os.path.dirname(snapshot_path), mode=0o700, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(snapshot_path))
+    with os.fdopen(fd, "wb") as f:
+        marshal.dump(table, f)
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_graph_snapshot(snapshot_path: str, digest: str) -> Optional[rdflib.Graph]:
+    """
+    Load a snapshot written by :func:`write_graph_snapshot`, or ``None`` if
+    missing, stale, or not owned by this user / writable by others (it is
+    unmarshalled before its hash can be checked).
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+                print("Warning: ignoring graph snapshot %s: not owned by this user or writable by others" % snapshot_path)
+                return None
+            table = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if table.get("version") != SNAPSHOT_VERSION or table.get("sha256") != digest:
+        return None
+    terms = [_decode_term(row) for row in table["terms"]]
+    graph = rdflib.Graph()
+    for prefix, namespace in table["namespaces"]:
+        graph.bind(prefix, namespace, override=True, replace=True)
+    graph.addN((terms[s], terms[p], terms[o], graph) for s, p, o in table["triples"])
+    return graph
+
+
+_snapshots: Dict[str, Tuple[Tuple, str, rdflib.Graph]] = {}
+_snapshots_lock = threading.Lock()
+
+
+def load_graph_snapshot(path: str, format: str = "turtle", snapshot_dir: Optional[str] = None) -> rdflib.Graph:
+    """
+    Return the graph in ``path`` as a read-only graph shared by the whole
+    process, parsing the source only when no snapshot matches its SHA-256.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _snapshots.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[2]
+    with _snapshots_lock:
+        cached = _snapshots.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[2]
+        digest = file_sha256(path)
+        if cached is not None and cached[1] == digest:
+            _snapshots[path] = (signature, digest, cached[2])
+            return cached[2]
+        snapshot_path = os.path.join(
+            snapshot_dir or SNAPSHOT_DIR or os.path.join(os.path.dirname(path), ".snapshots"),
+            "%s.%s.snapshot" % (os.path.basename(path), digest[:16]),
+        )
+        graph = read_graph_snapshot(snapshot_path, digest)
+        if graph is None:
+            graph = rdflib.Graph()
+            graph.parse(path, format=format)
+            try:
+                write_graph_snapshot(graph, snapshot_path, digest)
+            except OSError as e:
+                print("Warning: could not write graph snapshot %s: %s" % (snapshot_path, e))
+        shared = ReadOnlyGraphAggregate([graph])
+        _snapshots[path] = (signature, digest, shared)
+    return shared
+
+
+def clear_graph_snapshots() -> None:
+    """Drop the in-process graphs (snapshot files on disk are kept)."""
+    with _snapshots_lock:
+        _snapshots.clear()
+
+
+__all__ = [
+    "OverlayGraph",
+    "Vocabulary",
+    "resource_signature",
+    "get_vocabulary",
+    "clear_vocabularies",
+    "file_sha256",
+    "write_graph_snapshot",
+    "read_graph_snapshot",
+    "load_graph_snapshot",
+    "clear_graph_snapshots",
+]
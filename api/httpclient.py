@@ -0,0 +1,162 @@
+"""
+Shared, connection-pooled HTTP client for outbound requests.
+
+Every fetch (Dataverse files, schema.org exports, SPARQLmuse, CESSDA
+Skosmos, Ollama) goes through one :class:`requests.Session` per process
+so TCP/TLS connections are kept alive and reused instead of being
+re-established per call. The pool and retry policy are configured from
+the environment:
+
+- ``HTTP_POOL_CONNECTIONS``: number of per-host pools kept (default 16),
+- ``HTTP_POOL_MAXSIZE``: connections kept alive per host (default 32),
+- ``HTTP_RETRIES``: retries for connection errors and 429/5xx (default 2),
+- ``HTTP_BACKOFF``: exponential backoff factor in seconds (default 0.3).
+
+Connection errors are retried for every method. Status-based retries
+only apply to idempotent methods, so an Ollama ``POST`` is not re-sent
+after the server accepted it.
+
+``requests``/``urllib3`` speak HTTP/1.1 only; the keep-alive pool is
+what removes the per-call handshake.
+
+Async code (the ``/dvn`` enrichment fan-out) uses :func:`get_async_client`,
+a shared ``httpx.AsyncClient`` with the same pool size that negotiates
+HTTP/2 when the ``h2`` package is installed, together with
+:func:`upstream_limiter`, a process-wide semaphore per upstream service
+(``<NAME>_CONCURRENCY``, default ``UPSTREAM_CONCURRENCY`` = 64).
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 16))
+DEFAULT_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 32))
+DEFAULT_RETRIES = int(os.environ.get("HTTP_RETRIES", 2))
+DEFAULT_BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.3))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_CONCURRENCY = int(os.environ.get("UPSTREAM_CONCURRENCY", 64))
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_session(
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+) -> requests.Session:
+    """Build a session with keep-alive pools of ``pool_maxsize`` connections per host and retries with backoff."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide session, creating it on first use. A forked
+    worker (gunicorn, the batch CLI pool) gets its own session instead of
+    sharing the parent's sockets.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = create_session()
+            _session_pid = pid
+    return _session
+
+
+def close_session() -> None:
+    """Close the pooled connections (e.g. on application shutdown)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def create_async_client(
+    retries: int = DEFAULT_RETRIES,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    http2: bool = HTTP2_AVAILABLE,
+) -> httpx.AsyncClient:
+    """Build an async client; ``retries`` applies to connection failures only."""
+    limits = httpx.Limits(max_connections=pool_maxsize * 4, max_keepalive_connections=pool_maxsize)
+    transport = httpx.AsyncHTTPTransport(retries=retries, http2=http2, limits=limits)
+    return httpx.AsyncClient(transport=transport, follow_redirects=True)
+
+
+_async_client: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared async client of the running event loop."""
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client[0] is not loop:
+        _async_client = (loop, create_async_client())
+    return _async_client[1]
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None and _async_client[0] is asyncio.get_running_loop():
+        await _async_client[1].aclose()
+    _async_client = None
+
+
+_limiters: Dict[Tuple[str, int], asyncio.Semaphore] = {}
+
+
+def upstream_limiter(name: str, limit: Optional[int] = None) -> asyncio.Semaphore:
+    """
+    Semaphore shared by every request of this process that calls the
+    upstream service ``name``. The limit comes from ``limit``, else from
+    ``<NAME>_CONCURRENCY`` in the environment, else ``UPSTREAM_CONCURRENCY``.
+    """
+    key = (name, id(asyncio.get_running_loop()))
+    limiter = _limiters.get(key)
+    if limiter is None:
+        if limit is None:
+            limit = int(os.environ.get("%s_CONCURRENCY" % name.upper(), DEFAULT_CONCURRENCY))
+        limiter = _limiters[key] = asyncio.Semaphore(limit)
+    return limiter
+
+
+__all__ = [
+    "RETRY_STATUSES",
+    "HTTP2_AVAILABLE",
+    "create_session",
+    "get_session",
+    "close_session",
+    "create_async_client",
+    "get_async_client",
+    "close_async_client",
+    "upstream_limiter",
+]
@@ -0,0 +1,145 @@
+"""
+Offline JSON-LD contexts and the ``/cdi`` frame.
+
+pyld resolves every context referenced by URL through a document loader,
+by default an HTTP request. :func:`document_loader` serves the contexts
+in :data:`LOCAL_CONTEXTS` from the resources directory instead (each file
+is parsed once per process) and refuses any other URL unless
+``JSONLD_REMOTE_CONTEXTS=1``, so framing is deterministic and never
+waits on the network.
+
+:data:`CDI_FRAME_CONTEXT` and :data:`CDI_FRAME` are built once at import.
+pyld keeps processed contexts in a process-wide cache keyed by the
+context document, so reusing the same context means it is processed on
+the first call only; :func:`warm_cdi_frame` makes that call at startup.
+:func:`frame_cdi` frames generated CDI nodes around their
+``schema:Dataset``.
+"""
+
+import copy
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from pyld import jsonld as jsonldlib
+
+DDI_CDI_CONTEXT_URL = "https://docs.ddialliance.org/DDI-CDI/1.0/model/encoding/json-ld/ddi-cdi.jsonld"
+# Context URL -> file name in the resources directory
+LOCAL_CONTEXTS: Dict[str, str] = {
+    DDI_CDI_CONTEXT_URL: "ddi-cdi.jsonld",
+    DDI_CDI_CONTEXT_URL.replace("https://", "http://", 1): "ddi-cdi.jsonld",
+}
+ALLOW_REMOTE_CONTEXTS = os.environ.get("JSONLD_REMOTE_CONTEXTS", "0") == "1"
+
+CDI_FRAME_CONTEXT = {
+    "@vocab": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+    "schema": "https://schema.org/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "geosparql": "http://www.opengis.net/ont/geosparql#",
+    "spdx": "http://spdx.org/rdf/terms#",
+    "cdi": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+    "time": "http://www.w3.org/2006/time#",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "nx": "https://xas.org/dictionary/",
+    "cdifq": "https://cdif.codata.org/concept/",
+    "prov": "http://www.w3.org/ns/prov#",
+}
+CDI_FRAME = {
+    "@context": CDI_FRAME_CONTEXT,
+    "@type": "schema:Dataset",
+    "@embed": "@always",
+    "@explicit": False,
+}
+
+_documents: Dict[str, Any] = {}
+_lock = threading.Lock()
+_remote_loader = None
+
+
+def context_dir() -> str:
+    """``JSONLD_CONTEXT_DIR``, else the resources directory next to this module or the repo root."""
+    configured = os.environ.get("JSONLD_CONTEXT_DIR")
+    if configured:
+        return configured
+    here = os.path.dirname(os.path.abspath(__file__))
+    for candidate in (os.path.join(here, "resources"), os.path.join(os.path.dirname(here), "resources")):
+        if os.path.isdir(candidate):
+            return candidate
+    return os.path.join(here, "resources")
+
+
+def _local_document(url: str) -> Optional[Any]:
+    name = LOCAL_CONTEXTS.get(url.split("#", 1)[0])
+    if name is None:
+        return None
+    with _lock:
+        if url not in _documents:
+            with open(os.path.join(context_dir(), name), "rb") as f:
+                _documents[url] = json.loads(f.read())
+        return _documents[url]
+
+
+def document_loader(url: str, options: Optional[Dict] = None) -> Dict[str, Any]:
+    """pyld document loader serving :data:`LOCAL_CONTEXTS` from disk."""
+    global _remote_loader
+    try:
+        document = _local_document(url)
+    except (OSError, ValueError) as e:
+        raise jsonldlib.JsonLdError(
+            "Could not load local context for %s: %s" % (url, e),
+            "jsonld.LoadDocumentError",
+            {"url": url},
+            code="loading document failed",
+        )
+    if document is not None:
+        # pyld may add keys to the document it gets; keep the cached one intact
+        return {"contextUrl": None, "documentUrl": url, "document": copy.deepcopy(document)}
+    if not ALLOW_REMOTE_CONTEXTS:
+        raise jsonldlib.JsonLdError(
+            "Remote context %s is not available offline (set JSONLD_REMOTE_CONTEXTS=1 to fetch it)." % url,
+            "jsonld.LoadDocumentError",
+            {"url": url},
+            code="loading document failed",
+        )
+    if _remote_loader is None:
+        _remote_loader = jsonldlib.requests_document_loader(timeout=30)
+    return _remote_loader(url, options or {})
+
+
+def jsonld_options(**options: Any) -> Dict[str, Any]:
+    """pyld options using :func:`document_loader`."""
+    options.setdefault("documentLoader", document_loader)
+    return options
+
+
+def frame_cdi(nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    ``nodes`` framed by :data:`CDI_FRAME`, compacted with
+    :data:`CDI_FRAME_CONTEXT` (pyld's frame compacts its output with the
+    frame's context, so no separate compaction is needed).
+    """
+    return jsonldlib.frame(nodes, CDI_FRAME, jsonld_options())
+
+
+def warm_cdi_frame() -> None:
+    """Process :data:`CDI_FRAME_CONTEXT` and load the local contexts once."""
+    frame_cdi([])
+    for url in LOCAL_CONTEXTS:
+        try:
+            _local_document(url)
+        except (OSError, ValueError) as e:
+            print("Warning: could not load local JSON-LD context for %s: %s" % (url, e))
+
+
+__all__ = [
+    "DDI_CDI_CONTEXT_URL",
+    "LOCAL_CONTEXTS",
+    "CDI_FRAME_CONTEXT",
+    "CDI_FRAME",
+    "context_dir",
+    "document_loader",
+    "jsonld_options",
+    "frame_cdi",
+    "warm_cdi_frame",
+]
@@ -0,0 +1,76 @@
+"""
+Embedding of blank-node references in JSON-LD documents.
+
+:func:`inline_blank_nodes` replaces every bare reference
+``{"@id": "_:b0"}`` with the node object that carries that blank-node
+identifier elsewhere in the document, so clients of ``/cdi`` get nested
+objects instead of identifiers they would have to resolve themselves.
+
+Each node is expanded once and every reference to it points to the same
+result object, so the pass is linear in the size of the document even
+when blank nodes are shared by many parents or nested deeply. The
+result therefore contains shared subtrees; encode it (``json.dumps``)
+rather than modifying it in place. A reference to a node that is still
+being expanded (a cycle) is kept as a bare reference.
+"""
+
+from typing import Any, Dict, Set
+
+
+def _is_blank(node_id: Any) -> bool:
+    return isinstance(node_id, str) and node_id.startswith("_:")
+
+
+def _collect_blank_nodes(doc: Any) -> Dict[str, dict]:
+    # Node objects by blank-node identifier; bare references are skipped so
+    # that they never shadow the node they point to
+    nodes: Dict[str, dict] = {}
+    stack = [doc]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            node_id = obj.get("@id")
+            if _is_blank(node_id) and (len(obj) > 1 or node_id not in nodes):
+                nodes[node_id] = obj
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    return nodes
+
+
+def inline_blank_nodes(doc: Any) -> Any:
+    """
+    ``doc`` with blank-node references replaced by the referenced node
+    objects (see the module docstring). ``doc`` itself is not modified.
+    """
+    nodes = _collect_blank_nodes(doc)
+    expanded: Dict[str, dict] = {}
+    in_progress: Set[str] = set()
+
+    def expand(obj: Any) -> Any:
+        if isinstance(obj, list):
+            return [expand(item) for item in obj]
+        if not isinstance(obj, dict):
+            return obj
+        node_id = obj.get("@id")
+        if not _is_blank(node_id):
+            return {key: expand(value) for key, value in obj.items()}
+        done = expanded.get(node_id)
+        if done is not None:
+            return done
+        if node_id in in_progress:
+            return {"@id": node_id}
+        target = nodes[node_id]
+        if len(target) == 1:
+            # Nothing to embed: the node only occurs as a reference
+            return target
+        in_progress.add(node_id)
+        result = {key: expand(value) for key, value in target.items()}
+        in_progress.discard(node_id)
+        expanded[node_id] = result
+        return result
+
+    return expand(doc)
+
+
+__all__ = ["inline_blank_nodes"]
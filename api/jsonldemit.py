@@ -0,0 +1,140 @@
+"""
+Direct conversion of an rdflib graph to JSON-LD node objects.
+
+:func:`graph_to_jsonld` returns the same list of node objects as
+``json.loads(graph.serialize(format="json-ld"))`` (no context, so every
+value is in a list and IRIs are not compacted; nodes and values may come
+in a different order), built in one pass over the triples. rdflib's serializer queries the graph several times per
+triple (term selection, list detection, blank-node references) and the
+result then has to be encoded and decoded again; here the dicts and
+lists are produced directly and can be framed by pyld, embedded in a
+response or written to disk.
+
+The nodes are fresh objects owned by the caller, but values may be
+shared by several consumers (framing input and response body), so do
+not mutate them in place. NaN and infinite doubles stay typed strings
+(``{"@type": xsd:double, "@value": "NaN"}``) so the output is valid JSON.
+"""
+
+import json
+import math
+from typing import Any, Dict, List, Optional
+
+from rdflib import BNode, Literal, URIRef
+from rdflib.namespace import RDF, XSD
+
+Node = Dict[str, Any]
+# rdflib's serializer always emits these as native JSON values (its
+# use_native_types option ends up truthy), keeping "@type" next to them
+NATIVE_TYPES = frozenset((XSD.boolean, XSD.double, XSD.integer, XSD.string))
+
+
+def _collection(props: Dict[Any, list], head: Any, has_lists: bool) -> Optional[list]:
+    # The items of the well-formed RDF list starting at head, else None
+    # (same rules as rdflib's JSON-LD serializer)
+    if head == RDF.nil:
+        return []
+    if not has_lists or not any(p == RDF.first and o for p, o in props.get(head, ())):
+        return None
+    items = []
+    chain = {head}
+    cell = head
+    while cell:
+        if cell == RDF.nil:
+            return items
+        if isinstance(cell, URIRef):
+            return None
+        first = rest = None
+        for p, o in props.get(cell, ()):
+            if not first and p == RDF.first:
+                first = o
+            elif not rest and p == RDF.rest:
+                rest = o
+            elif p != RDF.type or o != RDF.List:
+                return None
+        items.append(first)
+        cell = rest
+        if cell in chain:
+            return None
+        chain.add(cell)
+    return None
+
+
+def graph_to_jsonld(graph) -> List[Node]:
+    """
+    Expanded JSON-LD node objects of ``graph``: one per subject (blank
+    nodes that are RDF list cells become ``@list`` values instead) and
+    one per blank node that only occurs as an object. Datasets
+    (context-aware graphs) fall back to rdflib's serializer.
+    """
+    if getattr(graph, "context_aware", False):
+        return json.loads(graph.serialize(format="json-ld"))
+
+    props: Dict[Any, list] = {}
+    referenced = set()
+    has_lists = False
+    for s, p, o in graph:
+        entry = props.get(s)
+        if entry is None:
+            entry = props[s] = []
+        entry.append((p, o))
+        if isinstance(o, BNode):
+            referenced.add(o)
+        if p == RDF.first:
+            has_lists = True
+
+    nodemap: Dict[str, Node] = {}
+
+    def value(o: Any) -> Any:
+        if isinstance(o, Literal):
+            if o.datatype:
+                native = o.toPython() if o.datatype in NATIVE_TYPES else o
+                if isinstance(native, float) and not math.isfinite(native):
+                    # JSON has no NaN/Infinity: use the XSD lexical form
+                    return {"@type": str(o.datatype), "@value": "NaN" if math.isnan(native) else ("INF" if native > 0 else "-INF")}
+                return {"@type": str(o.datatype), "@value": str(native) if isinstance(native, Literal) else native}
+            if o.language:
+                return {"@language": o.language, "@value": str(o)}
+            return {"@value": str(o)}
+        items = _collection(props, o, has_lists)
+        if items is not None:
+            return {"@list": [value(item) for item in items]}
+        if isinstance(o, BNode):
+            node_id = "_:" + o
+            if node_id not in nodemap:
+                add_node(o, node_id)
+            return {"@id": node_id}
+        if isinstance(o, URIRef):
+            return {"@id": str(o)}
+        return None
+
+    def add_node(s: Any, node_id: str) -> None:
+        node: Node = {"@id": node_id}
+        nodemap[node_id] = node
+        for p, o in props.get(s, ()):
+            if p == RDF.type:
+                key = "@type"
+                item = str(o) if isinstance(o, URIRef) else value(o)
+            else:
+                key = str(p)
+                item = value(o)
+            values = node.get(key)
+            if values is None:
+                node[key] = [item]
+            else:
+                values.append(item)
+
+    for s in props:
+        if isinstance(s, URIRef):
+            node_id = str(s)
+        elif isinstance(s, BNode) and s not in referenced:
+            node_id = "_:" + s
+        else:
+            # Referenced blank nodes are added where they are used
+            continue
+        if node_id not in nodemap:
+            add_node(s, node_id)
+    return list(nodemap.values())
+
+
+__all__ = ["graph_to_jsonld"]
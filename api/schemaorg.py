@@ -0,0 +1,223 @@
+"""
+schema.org metadata of Dataverse datasets, used to enrich CDI graphs.
+
+:func:`start_fetch` requests a dataset's schema.org export on a small
+per-process thread pool, so :func:`cdi_generator.generate_cdi` can parse
+the XDI file meanwhile; :func:`wait` then gives the fetch at most what
+is left of the caller's deadline. A fetch that misses the deadline keeps
+running and fills the cache for the next request (a stale cached copy,
+if any, is used meanwhile). Concurrent requests
+for the same dataset share one fetch.
+
+Exports are cached per ``(site, persistentId, datasetversion)`` as
+N-Triples, in memory and in an SQLite file shared by the workers
+(``SCHEMAORG_CACHE_SIZE``/``_TTL``/``_DB``, see
+:func:`cache.tiered_cache_from_env`; default
+``<tmp>/cdi-xas-cache/schemaorg.sqlite``). After
+``SCHEMAORG_REVALIDATE_SECONDS`` an entry is revalidated with its
+``ETag``/``Last-Modified``; the last good copy is served while Dataverse
+is unreachable. A failed first fetch is remembered for
+``SCHEMAORG_NEGATIVE_TTL`` seconds.
+
+Requests without a ``datasetid`` are not enriched: no other dataset's
+metadata can be assumed to describe the file.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+
+import rdflib
+import requests
+
+from cache import TTLCache, tiered_cache_from_env
+from httpclient import get_session
+
+DEFAULT_SITE = os.environ.get("SCHEMAORG_DEFAULT_SITE", "https://dataverse.dev.codata.org")
+# Seconds generate_cdi waits for the export (counted from its start)
+DEADLINE = float(os.environ.get("SCHEMAORG_DEADLINE", 10))
+# Per-request HTTP timeout of the fetch itself, which may outlive the deadline
+TIMEOUT = float(os.environ.get("SCHEMAORG_TIMEOUT", 30))
+REVALIDATE_SECONDS = float(os.environ.get("SCHEMAORG_REVALIDATE_SECONDS", 300))
+# Seconds a failed fetch is remembered before Dataverse is asked again
+NEGATIVE_TTL = float(os.environ.get("SCHEMAORG_NEGATIVE_TTL", 60))
+WORKERS = int(os.environ.get("SCHEMAORG_WORKERS", 8))
+
+Triple = Tuple[rdflib.term.Node, rdflib.term.Node, rdflib.term.Node]
+DatasetKey = Tuple[str, str, str]
+
+export_cache = tiered_cache_from_env(
+    "SCHEMAORG",
+    maxsize=1000,
+    ttl=7 * 86400,
+    path=os.path.join(tempfile.gettempdir(), "cdi-xas-cache", "schemaorg.sqlite"),
+)
+# Parsed triples of the cached N-Triples, so a hit is not parsed again
+_parsed = TTLCache(maxsize=256, ttl=7 * 86400)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_inflight: Dict[DatasetKey, Future] = {}
+_lock = threading.Lock()
+
+
+def dataset_key(source_url: Optional[str], datasetid: Optional[str], datasetversion: Optional[str] = None) -> Optional[DatasetKey]:
+    """
+    ``(site, persistentId, version)`` of the dataset to enrich with: the
+    site of ``source_url`` (or the default site for local files) and
+    ``datasetid``; None without a ``datasetid``.
+    """
+    if not datasetid:
+        return None
+    parsed = urlparse(source_url or "")
+    site = parsed.scheme + "://" + parsed.netloc if parsed.scheme in ("http", "https") and parsed.netloc else DEFAULT_SITE
+    return site.rstrip("/"), datasetid, datasetversion or ""
+
+
+def export_url(key: DatasetKey) -> str:
+    site, persistent_id, version = key
+    params = {"exporter": "schema.org", "persistentId": persistent_id}
+    if version:
+        params["version"] = version
+    return site + "/api/datasets/export?" + urlencode(params, safe="/")
+
+
+def _triples(entry: Dict) -> List[Triple]:
+    cache_key = (entry["url"], hash(entry["nt"]))
+    triples = _parsed.get(cache_key)
+    if triples is None:
+        graph = rdflib.Graph()
+        graph.parse(data=entry["nt"], format="nt")
+        triples = list(graph)
+        _parsed.set(cache_key, triples)
+    return triples
+
+
+def fetch_schemaorg(key: DatasetKey) -> List[Triple]:
+    """Triples of the dataset's schema.org export, from the cache when still valid."""
+    entry = export_cache.get(key)
+    if entry is not None and "error" in entry:
+        return []
+    if entry is not None and time.time() - entry["checked"] < REVALIDATE_SECONDS:
+        return _triples(entry)
+    url = export_url(key)
+    headers = {"Accept": "application/ld+json, application/json"}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        response = get_session().get(url, headers=headers, timeout=TIMEOUT)
+        if entry is not None and response.status_code == 304:
+            entry["checked"] = time.time()
+            export_cache.set(key, entry)
+            return _triples(entry)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if entry is None:
+            # Remember the failure briefly so an unreachable Dataverse is not asked on every request
+            export_cache.set(key, {"error": str(e) or type(e).__name__}, ttl=NEGATIVE_TTL)
+            raise
+        # Keep serving the last good copy while Dataverse is unavailable
+        print("Warning: could not revalidate schema.org export %s: %s" % (url, e))
+        entry["checked"] = time.time()
+        export_cache.set(key, entry)
+        return _triples(entry)
+    graph = rdflib.Graph()
+    graph.parse(data=response.text, format="json-ld", publicID=url)
+    entry = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "checked": time.time(),
+        "nt": graph.serialize(format="nt"),
+    }
+    export_cache.set(key, entry)
+    triples = list(graph)
+    _parsed.set((url, hash(entry["nt"])), triples)
+    return triples
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # One pool per process: a forked batch worker must not reuse the parent's threads
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="schemaorg")
+        _executor_pid = os.getpid()
+        _inflight.clear()
+    return _executor
+
+
+def start_fetch(key: DatasetKey) -> Future:
+    """Start (or join) the background fetch of ``key``."""
+    with _lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        future = _inflight[key] = _get_executor().submit(fetch_schemaorg, key)
+    # Outside the lock: the callback runs right away if the fetch is already done
+    future.add_done_callback(lambda done: _forget(key, done))
+    return future
+
+
+def _forget(key: DatasetKey, future: Future) -> None:
+    with _lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def wait(key: DatasetKey, future: Future, timeout: float) -> Optional[List[Triple]]:
+    """
+    The fetched triples; if the fetch is still running after ``timeout``
+    seconds, the cached copy being revalidated, if any. None if the fetch
+    failed or there is nothing to serve yet.
+    """
+    try:
+        return future.result(timeout=max(timeout, 0))
+    except FutureTimeoutError:
+        entry = export_cache.get(key)
+        if entry is not None and "nt" in entry:
+            return _triples(entry)
+        print("Warning: schema.org export %s not available within the deadline; continuing without it" % export_url(key))
+        return None
+    except Exception:
+        # Enrichment errors must not block core generation
+        return None
+
+
+def cached_fingerprint(key: DatasetKey) -> str:
+    """
+    Digest of the export cached for ``key`` without going to the network
+    ("" when nothing is cached, "error" for a remembered failure), so
+    results built from it can be cached. A stale entry is revalidated in
+    the background.
+    """
+    entry = export_cache.get(key)
+    if entry is None:
+        return ""
+    if "error" in entry:
+        return "error"
+    if time.time() - entry["checked"] >= REVALIDATE_SECONDS:
+        start_fetch(key)
+    return hashlib.sha256(entry["nt"].encode("utf-8")).hexdigest()
+
+
+def stats() -> Dict:
+    return {"cache": export_cache.stats(), "inflight": len(_inflight)}
+
+
+__all__ = [
+    "DEADLINE",
+    "dataset_key",
+    "export_url",
+    "fetch_schemaorg",
+    "start_fetch",
+    "wait",
+    "cached_fingerprint",
+    "stats",
+]
@@ -0,0 +1,40 @@
+"""
+Per-request stage timings.
+
+A :class:`StageTimer` accumulates wall-clock durations by stage name and
+renders them as a ``Server-Timing`` header value, so the cost of each
+step of a request shows up in the browser's network panel or in
+``curl -i`` output.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimer:
+    """Ordered ``stage -> seconds`` totals; a repeated stage adds up."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value, durations in milliseconds."""
+        return ", ".join("%s;dur=%.1f" % (name, seconds * 1000) for name, seconds in self.stages.items())
+
+
+__all__ = ["StageTimer"]
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ``/cdi`` result cache (``api/cdicache.py``).
+
+A local HTTP server stands in for Dataverse's
+``/api/access/datafile/<fileid>``: it serves ``--source`` with an
+``ETag`` after ``--latency`` seconds (and ``304`` for a matching
+``If-None-Match``). Each request is timed as:
+
+- regenerate: download, ``generate_cdi``, emit, frame, inline and
+  encode (``/cdi`` without the cache),
+- miss: the same through the cache (the download is hashed while it is
+  spooled, the spooled copy is parsed, then the document is stored),
+- memory hit: a conditional GET for the source, then the memory tier,
+- disk hit: the same with the memory tier cleared (another worker),
+- 304: the client sends the ``ETag`` back.
+
+Usage::
+
+    python benchmarks/bench_cdi_cache.py --latency 0.05 --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+
+def fake_dataverse(body: bytes, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            if self.headers.get("If-None-Match") == '"bench"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"bench"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d/api/access/datafile/1" % server.server_port
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "pt_metal_rt.xdi"))
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake Dataverse takes per request")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    os.environ["CDI_CACHE_DIR"] = os.path.join(workdir, "cdi")
+    os.environ["CDI_SOURCE_CACHE_DB"] = os.path.join(workdir, "sources.sqlite")
+    with open(args.source, "rb") as f:
+        server, url = fake_dataverse(f.read(), args.latency)
+
+    from cdi_generator import generate_cdi
+    from jsonldcontext import CDI_FRAME_CONTEXT, context_dir, frame_cdi
+    from jsonldembed import inline_blank_nodes
+    from jsonldemit import graph_to_jsonld
+    from utils import get_resources_dir
+    import cdicache
+
+    params = {"format": "json-ld", "type": "xas", "datasetid": None, "datasetversion": None}
+    resources_dirs = (get_resources_dir(), context_dir())
+
+    def build(source):
+        graph = generate_cdi(url, None, "json-ld", None, "xas", source=source)
+        nodes = graph_to_jsonld(graph)
+        framed = inline_blank_nodes(frame_cdi(nodes))
+        return json.dumps({"@context": CDI_FRAME_CONTEXT, "@graph": framed.get("@graph", [framed]), "CDIGenerated": nodes}).encode("utf-8")
+
+    def regenerate():
+        return build(None)
+
+    etags = []
+
+    def cached(etag=None):
+        digest, source = cdicache.source_digest(url)
+        key = cdicache.result_key(digest, params, resources_dirs, None)
+        etags.append(key)
+        if etag == key:
+            return None
+        document = cdicache.result_cache.get(key)
+        try:
+            if document is None:
+                document = build(source)
+                cdicache.result_cache.set(key, document)
+        finally:
+            if source is not None:
+                source.close()
+        return document
+
+    def disk_hit():
+        cdicache.result_cache.memory.clear()
+        return cached()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        regenerate()
+    runs = [
+        ("regenerate", regenerate, args.repeat),
+        ("miss", cached, 1),
+        ("memory hit", cached, args.repeat),
+        ("disk hit", disk_hit, args.repeat),
+        ("304", lambda: cached(etags[0]), args.repeat),
+    ]
+    print(f"fake Dataverse latency {args.latency * 1000:.0f} ms")
+    for name, func, repeat in runs:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:12} {best * 1000:8.1f} ms")
+    print(json.dumps(cdicache.stats()["results"]))
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark ``/cdi`` framing before and after :mod:`jsonldcontext`.
+
+Before: the frame and its context were rebuilt as literals per request,
+framed with pyld's default (HTTP) document loader, and the framed output
+was compacted again with the same context. After:
+:func:`jsonldcontext.frame_cdi` with the prebuilt frame, the offline
+loader and no second compaction.
+
+The input is the CDI graph of ``--source`` merged with
+``resources/CDIF-XAS-FullExample.jsonLD`` (standing in for the schema.org
+enrichment, so the frame matches a ``schema:Dataset``). The first call
+is measured after clearing pyld's context caches ("cold"), then the best
+of ``--repeat`` calls ("warm"). Both paths must give the same document.
+
+Usage::
+
+    python benchmarks/bench_cdi_frame.py --repeat 20
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import rdflib
+from pyld import jsonld as jsonldlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+from cdi_generator import generate_cdi  # noqa: E402
+from jsonldcontext import frame_cdi  # noqa: E402
+from jsonldemit import graph_to_jsonld  # noqa: E402
+
+
+def legacy_frame(nodes):
+    frame_context = {
+        "@vocab": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+        "schema": "https://schema.org/",
+        "dcterms": "http://purl.org/dc/terms/",
+        "geosparql": "http://www.opengis.net/ont/geosparql#",
+        "spdx": "http://spdx.org/rdf/terms#",
+        "cdi": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+        "time": "http://www.w3.org/2006/time#",
+        "skos": "http://www.w3.org/2004/02/skos/core#",
+        "nx": "https://xas.org/dictionary/",
+        "cdifq": "https://cdif.codata.org/concept/",
+        "prov": "http://www.w3.org/ns/prov#"
+    }
+    frame = {
+        "@context": frame_context,
+        "@type": "schema:Dataset",
+        "@embed": "@always",
+        "@explicit": False
+    }
+    framed = jsonldlib.frame(nodes, frame)
+    return jsonldlib.compact(framed, frame_context)
+
+
+def build_nodes(source: str, example: str):
+    with contextlib.redirect_stdout(io.StringIO()):
+        cdi_graph = generate_cdi(source, None, "json-ld", None, "xas", enrich=False)
+    graph = rdflib.Graph()
+    graph += cdi_graph
+    graph.parse(example, format="json-ld")
+    return graph_to_jsonld(graph)
+
+
+def measure(func, nodes, repeat: int):
+    jsonldlib._resolved_context_cache.clear()
+    jsonldlib._inverse_context_cache.clear()
+    start = time.perf_counter()
+    result = func(nodes)
+    cold = time.perf_counter() - start
+    warm = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(nodes)
+        elapsed = time.perf_counter() - start
+        warm = elapsed if warm is None else min(warm, elapsed)
+    return cold, warm, result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "pt_metal_rt.xdi"))
+    parser.add_argument("--example", default=os.path.join(REPO_ROOT, "resources", "CDIF-XAS-FullExample.jsonLD"))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    nodes = build_nodes(args.source, args.example)
+    print(f"{len(nodes)} nodes")
+    results = {}
+    for name, func in (("legacy", legacy_frame), ("frame_cdi", frame_cdi)):
+        cold, warm, results[name] = measure(func, nodes, args.repeat)
+        print(f"{name:10} cold {cold * 1000:7.1f} ms   warm {warm * 1000:7.1f} ms")
+    if json.dumps(results["legacy"], sort_keys=True) != json.dumps(results["frame_cdi"], sort_keys=True):
+        print("MISMATCH: framed documents differ")
+        return 1
+    print("framed documents equal")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
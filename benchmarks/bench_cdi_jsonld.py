@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark the JSON-LD stages of ``/cdi`` before and after emitting once.
+
+The previous pipeline serialised the CDI graph with rdflib twice (a
+sanity check in ``generate_cdi`` and the response document), then ran
+``json.loads`` on it once for framing and once more for ``CDIGenerated``.
+The current one builds the node objects with
+:func:`jsonldemit.graph_to_jsonld` and feeds framing and the response
+from them. Both are timed stage by stage on the graph generated from
+``--source`` (``resources/pt_metal_rt.xdi``, no schema.org enrichment);
+``--copies`` merges several independent parses into one larger graph.
+The framed documents and the node sets must be equal (up to the order
+of array items).
+
+Usage::
+
+    python benchmarks/bench_cdi_jsonld.py --copies 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+
+import rdflib
+from pyld import jsonld as jsonldlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+from cdi_generator import generate_cdi  # noqa: E402
+from jsonldemit import graph_to_jsonld  # noqa: E402
+from timing import StageTimer  # noqa: E402
+
+FRAME_CONTEXT = {
+    "@vocab": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+    "schema": "https://schema.org/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "cdi": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "prov": "http://www.w3.org/ns/prov#",
+}
+FRAME = {"@context": FRAME_CONTEXT, "@type": "schema:Dataset", "@embed": "@always", "@explicit": False}
+
+
+def build_graph(source: str, copies: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph = generate_cdi(source, None, "json-ld", None, "xas", enrich=False)
+        if copies == 1:
+            return graph
+        merged = rdflib.Graph()
+        merged += graph
+        for _ in range(copies - 1):
+            merged += generate_cdi(source, None, "json-ld", None, "xas", enrich=False)
+    return merged
+
+
+def legacy_pipeline(graph, timer: StageTimer):
+    with timer.stage("sanity-serialize"):
+        graph.serialize(format="json-ld")
+    with timer.stage("serialize"):
+        cdi_jsonld = graph.serialize(format="json-ld")
+    with timer.stage("loads"):
+        doc = json.loads(cdi_jsonld)
+    with timer.stage("frame"):
+        framed = jsonldlib.frame(doc, FRAME)
+    with timer.stage("compact"):
+        compacted = jsonldlib.compact(framed, FRAME_CONTEXT)
+    with timer.stage("loads"):
+        generated = json.loads(cdi_jsonld)
+    with timer.stage("encode"):
+        json.dumps({"@graph": compacted, "CDIGenerated": generated})
+    return framed, generated
+
+
+def emit_once_pipeline(graph, timer: StageTimer):
+    with timer.stage("emit"):
+        nodes = graph_to_jsonld(graph)
+    with timer.stage("frame"):
+        framed = jsonldlib.frame(nodes, FRAME)
+    with timer.stage("compact"):
+        compacted = jsonldlib.compact(framed, FRAME_CONTEXT)
+    with timer.stage("encode"):
+        json.dumps({"@graph": compacted, "CDIGenerated": nodes})
+    return framed, nodes
+
+
+def run(pipeline, graph, repeat: int):
+    best = None
+    for _ in range(repeat):
+        timer = StageTimer()
+        result = pipeline(graph, timer)
+        if best is None or timer.total() < best[0].total():
+            best = (timer, result)
+    return best
+
+
+def canonical(value):
+    # Node and value order follow the store's triple order, which may differ
+    if isinstance(value, list):
+        return sorted((canonical(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, dict):
+        return {key: canonical(item) for key, item in value.items()}
+    return value
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "pt_metal_rt.xdi"))
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    graph = build_graph(args.source, args.copies)
+    print(f"{len(graph)} triples")
+    legacy_timer, (legacy_framed, legacy_nodes) = run(legacy_pipeline, graph, args.repeat)
+    timer, (framed, nodes) = run(emit_once_pipeline, graph, args.repeat)
+    for name, stages in (("legacy", legacy_timer), ("emit-once", timer)):
+        breakdown = "  ".join(f"{stage} {seconds * 1000:.1f}" for stage, seconds in stages.stages.items())
+        print(f"{name:10} {stages.total() * 1000:8.1f} ms   [{breakdown}]")
+    print(f"speedup    {legacy_timer.total() / timer.total():.1f}x")
+    if canonical(legacy_nodes) != canonical(nodes) or canonical(legacy_framed) != canonical(framed):
+        print("MISMATCH: outputs differ")
+        return 1
+    print("outputs equal")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Cold-versus-warm benchmark for loading ``resources/ddi-cdi-full-graph.ttl``.
+
+Compares:
+
+- ``turtle``:   parsing the Turtle source (what every DataLearning did before),
+- ``build``:    first load in a fresh snapshot directory (parse + write snapshot),
+- ``snapshot``: a new process loading the existing binary snapshot,
+- ``warm``:     a further load in the same process (shared graph).
+
+Usage::
+
+    python benchmarks/bench_full_graph.py --repeat 5
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import rdflib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+from graphstore import clear_graph_snapshots, load_graph_snapshot  # noqa: E402
+
+
+def timed(func, repeat: int = 1):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "ddi-cdi-full-graph.ttl"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    snapshot_dir = tempfile.mkdtemp(prefix="cdi-snapshot-bench-")
+    try:
+        def parse_turtle():
+            graph = rdflib.Graph()
+            graph.parse(args.source, format="turtle")
+            return graph
+
+        def load_cold():
+            clear_graph_snapshots()
+            return load_graph_snapshot(args.source, snapshot_dir=snapshot_dir)
+
+        elapsed, graph = timed(parse_turtle, args.repeat)
+        print(f"turtle    {elapsed * 1000:9.1f} ms   {len(graph)} triples")
+        elapsed, graph = timed(load_cold)
+        print(f"build     {elapsed * 1000:9.1f} ms   {len(graph)} triples")
+        elapsed, graph = timed(load_cold, args.repeat)
+        print(f"snapshot  {elapsed * 1000:9.1f} ms   {len(graph)} triples")
+        elapsed, graph = timed(lambda: load_graph_snapshot(args.source, snapshot_dir=snapshot_dir), args.repeat)
+        print(f"warm      {elapsed * 1000:9.3f} ms   {len(graph)} triples")
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
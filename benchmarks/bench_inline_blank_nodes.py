@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark :func:`jsonldembed.inline_blank_nodes` against the
+``collect_nodes``/``inline_refs``/``deep_clone`` pass ``/cdi`` used
+before (with its node lookup fixed, see ``legacy_inline``; unfixed, it
+leaves references unresolved whenever a bare reference comes after the
+node it refers to).
+
+Checks, on ``resources/CDIF-XAS-FullExample.jsonLD``:
+
+- the document framed and compacted like ``/cdi`` and its flattened
+  form (every blank node a top-level node, referenced by ``@id``) give
+  the same result with both implementations, and no blank-node
+  reference is left in the flattened one,
+- a cycle of blank nodes terminates with one bare reference left,
+- the shared result is not a copy: every reference to a node is the
+  same object.
+
+The scaling benchmark builds synthetic flattened documents of ``n``
+nodes: a binary tree of ``n / 2`` blank nodes whose root (and one other
+tree node) is referenced by each of ``n / 2`` dataset nodes. The old
+pass clones the tree for every reference, so its time grows with the
+square of ``n``; the new one expands each node once.
+
+Usage::
+
+    python benchmarks/bench_inline_blank_nodes.py --sizes 250 500 1000 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import rdflib
+from pyld import jsonld as jsonldlib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+from jsonldembed import inline_blank_nodes  # noqa: E402
+from jsonldemit import graph_to_jsonld  # noqa: E402
+
+FRAME_CONTEXT = {
+    "@vocab": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+    "schema": "https://schema.org/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "cdi": "http://ddialliance.org/Specification/DDI-CDI/1.0/RDF/",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "prov": "http://www.w3.org/ns/prov#",
+}
+FRAME = {"@context": FRAME_CONTEXT, "@type": "schema:Dataset", "@embed": "@always", "@explicit": False}
+
+
+def legacy_inline(compacted, keep_nodes: bool = True):
+    # The pass previously inlined in api.py's cdi_generate. With keep_nodes
+    # a later bare reference no longer replaces the node it refers to in
+    # node_map (the original did, and then left that reference unresolved)
+    def collect_nodes(obj, store):
+        if isinstance(obj, dict):
+            node_id = obj.get("@id")
+            if node_id and node_id.startswith("_:") and not (keep_nodes and len(obj) == 1 and node_id in store):
+                store[node_id] = obj
+            for v in obj.values():
+                collect_nodes(v, store)
+        elif isinstance(obj, list):
+            for v in obj:
+                collect_nodes(v, store)
+
+    def deep_clone(o):
+        try:
+            return json.loads(json.dumps(o))
+        except Exception:
+            return o
+
+    def inline_refs(obj, node_map, seen_ids):
+        if isinstance(obj, dict):
+            if set(obj.keys()) == {"@id"} and isinstance(obj.get("@id"), str) and obj["@id"].startswith("_:"):
+                ref_id = obj["@id"]
+                target = node_map.get(ref_id)
+                if target and ref_id not in seen_ids:
+                    seen_ids.add(ref_id)
+                    inlined = inline_refs(deep_clone(target), node_map, seen_ids)
+                    seen_ids.discard(ref_id)
+                    return inlined
+                return obj
+            return {k: inline_refs(v, node_map, seen_ids) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [inline_refs(v, node_map, seen_ids) for v in obj]
+        return obj
+
+    node_map = {}
+    collect_nodes(compacted, node_map)
+    return inline_refs(compacted, node_map, set())
+
+
+def blank_references(obj) -> int:
+    if isinstance(obj, dict):
+        own = 1 if len(obj) == 1 and str(obj.get("@id", "")).startswith("_:") else 0
+        return own + sum(blank_references(v) for v in obj.values())
+    if isinstance(obj, list):
+        return sum(blank_references(v) for v in obj)
+    return 0
+
+
+def check_full_example(path: str) -> int:
+    graph = rdflib.Graph()
+    graph.parse(path, format="json-ld")
+    nodes = graph_to_jsonld(graph)
+    compacted = jsonldlib.compact(jsonldlib.frame(nodes, FRAME), FRAME_CONTEXT)
+    flattened = jsonldlib.flatten(nodes)
+    failures = 0
+    for name, doc in (("framed", compacted), ("flattened", flattened)):
+        before = json.dumps(doc)
+        new, old = inline_blank_nodes(doc), legacy_inline(doc)
+        ok = json.dumps(new) == json.dumps(old) and json.dumps(doc) == before
+        if name == "flattened":
+            ok = ok and blank_references(doc) > 0 and blank_references(new) == 0
+        failures += not ok
+        print(f"check  FullExample {name:9}  {'ok' if ok else 'FAILED'}  ({blank_references(doc)} references)")
+
+    cycle = [{"@id": "_:a", "next": {"@id": "_:b"}}, {"@id": "_:b", "next": {"@id": "_:a"}}]
+    result = inline_blank_nodes(cycle)
+    ok = blank_references(result) == 2 and result[0]["next"]["next"] == {"@id": "_:a"}
+    failures += not ok
+    print(f"check  cycle                  {'ok' if ok else 'FAILED'}")
+
+    doc = synthetic_document(20)
+    result = inline_blank_nodes(doc)
+    roots = [node["hasPart"] for node in result if not node["@id"].startswith("_:")]
+    ok = all(root is roots[0] for root in roots)
+    failures += not ok
+    print(f"check  shared subtrees        {'ok' if ok else 'FAILED'}")
+    return failures
+
+
+def synthetic_document(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    size = max(n // 2, 1)
+    doc = []
+    for i in range(size):
+        node = {"@id": "_:b%d" % i, "@type": "Component", "name": "component %d" % i}
+        children = [{"@id": "_:b%d" % c} for c in (2 * i + 1, 2 * i + 2) if c < size]
+        if children:
+            node["hasPart"] = children
+        doc.append(node)
+    for i in range(n - size):
+        doc.append({
+            "@id": "https://example.org/dataset/%d" % i,
+            "@type": "Dataset",
+            "hasPart": {"@id": "_:b0"},
+            "about": {"@id": "_:b%d" % rnd.randrange(size)},
+        })
+    return doc
+
+
+def timed(func, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "CDIF-XAS-FullExample.jsonLD"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    failures = check_full_example(args.source)
+    for n in args.sizes:
+        doc = synthetic_document(n)
+        legacy = timed(lambda: legacy_inline(doc), args.repeat)
+        new = timed(lambda: inline_blank_nodes(doc), args.repeat)
+        print(f"n={n:6}  legacy {legacy * 1000:9.1f} ms   inline_blank_nodes {new * 1000:7.2f} ms   ({legacy / new:.0f}x)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
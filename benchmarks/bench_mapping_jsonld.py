@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the column-oriented ``xdi_cdif_mapping_to_jsonld`` against the
+previous ``DataFrame.iterrows`` implementation.
+
+The rows of ``resources/XDI-CDIF-Mapping.xlsx`` are repeated until the
+sheet holds ``--rows`` rows (10k by default); both implementations must
+produce the same JSON-LD.
+
+Usage::
+
+    python benchmarks/bench_mapping_jsonld.py --rows 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils import _parse_json_like_fragment, xdi_cdif_mapping_to_jsonld  # noqa: E402
+
+
+def legacy_mapping_to_jsonld(df: pd.DataFrame, base_uri: str = "https://w3id.org/cdi-xas/mapping/") -> Dict[str, Any]:
+    graph = []
+    for idx, row in df.iterrows():
+        node: Dict[str, Any] = {"@id": f"{base_uri}{idx}"}
+        for col, value in row.items():
+            if pd.isna(value):
+                continue
+            col_name = str(col)
+            if col_name.startswith("Unnamed:"):
+                _, _, suffix = col_name.partition(":")
+                suffix = suffix.strip()
+                col_name = f"Column {suffix}" if suffix else "Column"
+            if isinstance(value, str):
+                stripped = value.strip()
+                parsed_value: Any = value
+                if stripped.startswith("{") or stripped.startswith("["):
+                    try:
+                        parsed_value = json.loads(stripped)
+                    except Exception:
+                        parsed_value = value
+                elif stripped.startswith('"') and '":' in stripped:
+                    maybe_parsed = _parse_json_like_fragment(stripped)
+                    if not isinstance(maybe_parsed, str):
+                        parsed_value = maybe_parsed
+                node[col_name] = parsed_value
+            else:
+                node[col_name] = value
+        graph.append(node)
+    return {"@graph": graph}
+
+
+def scaled_sheet(source: str, rows: int) -> pd.DataFrame:
+    df = pd.read_excel(source)
+    repeats = -(-rows // len(df))
+    return pd.concat([df] * repeats, ignore_index=True).head(rows)
+
+
+def timed(func, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "XDI-CDIF-Mapping.xlsx"))
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = scaled_sheet(args.source, args.rows)
+    print(f"{len(df)} rows x {len(df.columns)} columns")
+    legacy_time, legacy = timed(lambda: legacy_mapping_to_jsonld(df), args.repeat)
+    print(f"iterrows  best {legacy_time * 1000:9.1f} ms")
+    columnar_time, columnar = timed(lambda: xdi_cdif_mapping_to_jsonld(df), args.repeat)
+    print(f"columnar  best {columnar_time * 1000:9.1f} ms   ({legacy_time / columnar_time:.1f}x)")
+    if json.dumps(legacy) != json.dumps(columnar):
+        print("MISMATCH: outputs differ")
+        return 1
+    print("outputs identical")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark schema.org enrichment in ``generate_cdi`` against a slow Dataverse.
+
+A local HTTP server stands in for Dataverse: it answers the schema.org
+export of ``--triples`` ``schema:Dataset`` properties after ``--latency``
+seconds, with an ``ETag`` (and ``304`` for a matching ``If-None-Match``).
+``--source`` is converted with:
+
+- legacy: parse the XDI file, then fetch the export, parse it and add
+  the triples one by one (the previous ``generate_cdi``),
+- cold: ``generate_cdi`` with an empty cache (the fetch runs while the
+  file is parsed),
+- warm: ``generate_cdi`` again (served from the cache),
+- revalidated: after the entry went stale (one conditional request),
+- deadline: a fresh dataset whose export is slower than
+  ``SCHEMAORG_DEADLINE`` (enrichment is skipped).
+
+Usage::
+
+    python benchmarks/bench_schemaorg_enrich.py --latency 0.5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rdflib
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+
+def fake_dataverse(latency: float, triples: int):
+    document = {
+        "@context": {"@vocab": "https://schema.org/"},
+        "@id": "https://doi.org/10.5072/FK2/BENCH",
+        "@type": "Dataset",
+        "name": "Benchmark dataset",
+        "keywords": ["keyword %d" % i for i in range(triples)],
+    }
+    body = json.dumps(document).encode("utf-8")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency * (10 if "slow" in self.path else 1))
+            if self.headers.get("If-None-Match") == '"bench"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", '"bench"')
+            self.send_header("Content-Type", "application/ld+json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:%d" % server.server_port
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "pt_metal_rt.xdi"))
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the fake Dataverse takes per export")
+    parser.add_argument("--triples", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    os.environ["SCHEMAORG_CACHE_DB"] = os.path.join(workdir, "schemaorg.sqlite")
+    os.environ["SCHEMAORG_REVALIDATE_SECONDS"] = "1"
+    os.environ.setdefault("SCHEMAORG_DEADLINE", str(args.latency * 4))
+    server, site = fake_dataverse(args.latency, args.triples)
+
+    from cdi import CDI_DDI
+    from cdi_generator import generate_cdi
+    from httpclient import get_session
+    import schemaorg
+
+    schemaorg.DEFAULT_SITE = site
+    dataset = rdflib.URIRef("https://doi.org/10.5072/FK2/BENCH")
+
+    def legacy(persistent_id):
+        resources = os.path.join(REPO_ROOT, "resources")
+        graph = CDI_DDI(url=args.source, resources_dir=resources, type="xas").parse_cdi()
+        url = schemaorg.export_url((site, persistent_id, ""))
+        response = get_session().get(url, headers={"Accept": "application/ld+json, application/json"}, timeout=30)
+        response.raise_for_status()
+        schema_graph = rdflib.Graph()
+        schema_graph.parse(data=response.text, format="json-ld", publicID=url)
+        for triple in schema_graph:
+            graph.add(triple)
+        return graph
+
+    def current(persistent_id):
+        return generate_cdi(args.source, None, "json-ld", None, "xas", datasetid=persistent_id)
+
+    runs = [
+        ("legacy", legacy, "doi:legacy"),
+        ("cold", current, "doi:bench"),
+        ("warm", current, "doi:bench"),
+        ("revalidated", current, "doi:bench"),
+        ("deadline", current, "doi:slow"),
+    ]
+    print(f"fake Dataverse latency {args.latency * 1000:.0f} ms, deadline {schemaorg.DEADLINE * 1000:.0f} ms")
+    for name, func, persistent_id in runs:
+        if name == "revalidated":
+            time.sleep(1.1)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            graph = func(persistent_id)
+        elapsed = time.perf_counter() - start
+        enriched = (dataset, None, None) in graph
+        print(f"{name:12} {elapsed * 1000:8.1f} ms   enriched={enriched}")
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-memory spreadsheet reader against pandas and xlsx2csv.
+
+A workbook shaped like ``resources/XDI-CDIF-Mapping.xlsx`` (its text
+columns, plus numeric and date columns) is generated with ``--rows``
+rows, Excel-style with a shared strings table; ``--source`` benchmarks an
+existing workbook instead. Two paths are timed from the in-memory bytes:
+
+- DataFrame: ``pd.read_excel`` with its default (openpyxl) engine vs
+  :func:`spreadsheet.read_sheet`, which must return an equal frame,
+- CSV: ``Xlsx2csv`` on a temporary file (the previous ``/markitdown``
+  path) vs :func:`spreadsheet.iter_csv`, which must return the same text.
+  ``xlsx2csv`` is not a dependency of the service; without it only the
+  :func:`spreadsheet.iter_csv` times are printed.
+
+Every available engine of :mod:`spreadsheet` is measured.
+
+Usage::
+
+    python benchmarks/bench_spreadsheet.py --rows 100000
+"""
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+try:
+    from xlsx2csv import Xlsx2csv
+except ImportError:
+    Xlsx2csv = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from spreadsheet import CALAMINE_AVAILABLE, iter_csv, iter_sheet_rows, read_sheet  # noqa: E402
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="%s/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>" % _REL_NS
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="%s" xmlns:r="%s"><sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        % (_MAIN_NS, _REL_NS)
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="%s/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="%s/styles" Target="styles.xml"/>'
+        '<Relationship Id="rId3" Type="%s/sharedStrings" Target="sharedStrings.xml"/>'
+        "</Relationships>" % (_REL_NS, _REL_NS, _REL_NS)
+    ),
+    # Style 1 is an ISO date format, which xlsx2csv renders like iter_csv
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="%s"><numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/></numFmts><fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs></styleSheet>'
+        % _MAIN_NS
+    ),
+}
+
+
+def _column_letters(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def generate_workbook(rows: int, template: str, seed: int = 1) -> bytes:
+    """An ``.xlsx`` with the template's text rows repeated and three numeric/date columns."""
+    df = pd.read_excel(template)
+    text_rows = [[None if pd.isna(value) else str(value) for value in row] for row in df.values.tolist()]
+    header = [str(col) for col in df.columns] + ["energy", "mu", "count", "date"]
+    strings, string_ids = [], {}
+
+    def sst(value: str) -> int:
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    letters = [_column_letters(i) for i in range(len(header))]
+    rnd = random.Random(seed)
+    epoch = datetime.date(1899, 12, 30)
+    sheet = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?><worksheet xmlns="%s">' % _MAIN_NS,
+        '<dimension ref="A1:%s%d"/><sheetData>' % (letters[-1], rows + 1),
+        '<row r="1">%s</row>' % "".join(
+            '<c r="%s1" t="s"><v>%d</v></c>' % (letters[i], sst(name)) for i, name in enumerate(header)
+        ),
+    ]
+    for number in range(2, rows + 2):
+        cells = []
+        for i, value in enumerate(text_rows[(number - 2) % len(text_rows)]):
+            if value is not None:
+                cells.append('<c r="%s%d" t="s"><v>%d</v></c>' % (letters[i], number, sst(value)))
+        base = len(text_rows[0])
+        day = (datetime.date(2020, 1, 1) + datetime.timedelta(days=number % 1000) - epoch).days
+        cells.append('<c r="%s%d"><v>%r</v></c>' % (letters[base], number, rnd.random() * 1e4))
+        cells.append('<c r="%s%d"><v>%r</v></c>' % (letters[base + 1], number, rnd.random()))
+        cells.append('<c r="%s%d"><v>%d</v></c>' % (letters[base + 2], number, number - 2))
+        cells.append('<c r="%s%d" s="1"><v>%d</v></c>' % (letters[base + 3], number, day))
+        sheet.append('<row r="%d">%s</row>' % (number, "".join(cells)))
+    sheet.append("</sheetData></worksheet>")
+    shared = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?><sst xmlns="%s" count="%d" uniqueCount="%d">'
+              % (_MAIN_NS, len(strings), len(strings))]
+    shared.extend('<si><t xml:space="preserve">%s</t></si>' % escape(value) for value in strings)
+    shared.append("</sst>")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr("xl/worksheets/sheet1.xml", "".join(sheet))
+        archive.writestr("xl/sharedStrings.xml", "".join(shared))
+    return buffer.getvalue()
+
+
+def xlsx2csv_via_tempfile(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp_file:
+        tmp_file.write(data)
+        tmp_path = tmp_file.name
+    try:
+        output = io.StringIO()
+        Xlsx2csv(tmp_path, outputencoding="utf-8").convert(output)
+        return output.getvalue()
+    finally:
+        os.unlink(tmp_path)
+
+
+def timed(func, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", help="benchmark this workbook instead of a generated one")
+    parser.add_argument("--template", default=os.path.join(REPO_ROOT, "resources", "XDI-CDIF-Mapping.xlsx"))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.source:
+        with open(args.source, "rb") as f:
+            data = f.read()
+    else:
+        data = generate_workbook(args.rows, args.template)
+    print(f"workbook: {len(data) / 1e6:.1f} MB")
+    engines = ["openpyxl"] + (["calamine"] if CALAMINE_AVAILABLE else [])
+    failures = 0
+
+    baseline_time, baseline = timed(lambda: pd.read_excel(io.BytesIO(data)), args.repeat)
+    print(f"DataFrame  pd.read_excel        {baseline_time:7.2f} s   {len(baseline)} rows")
+    for engine in engines:
+        elapsed, df = timed(lambda: read_sheet(data, engine=engine), args.repeat)
+        try:
+            pd.testing.assert_frame_equal(baseline, df)
+            check = "equal"
+        except AssertionError:
+            check, failures = "MISMATCH", failures + 1
+        print(f"DataFrame  read_sheet[{engine:8}]  {elapsed:7.2f} s   ({baseline_time / elapsed:.1f}x, {check})")
+
+    if Xlsx2csv is None:
+        baseline_time = baseline = None
+        print("CSV        xlsx2csv not installed, not compared")
+    else:
+        baseline_time, baseline = timed(lambda: xlsx2csv_via_tempfile(data), args.repeat)
+        print(f"CSV        xlsx2csv (temp file)  {baseline_time:7.2f} s   {len(baseline) / 1e6:.1f} MB")
+    for engine in engines:
+        elapsed, text = timed(lambda: "".join(iter_csv(iter_sheet_rows(data, engine=engine))), args.repeat)
+        if baseline is None:
+            print(f"CSV        iter_csv[{engine:8}]    {elapsed:7.2f} s   {len(text) / 1e6:.1f} MB")
+            continue
+        check = "identical" if text == baseline else "differs"
+        # The generated dates use an ISO format, so every engine must match xlsx2csv
+        if text != baseline and not args.source:
+            failures += 1
+        print(f"CSV        iter_csv[{engine:8}]    {elapsed:7.2f} s   ({baseline_time / elapsed:.1f}x, {check})")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming XDI tokenizer against the previous
+``response.text.split("\\n")`` + regex line loop of ``CDI_DDI.parse_cdi``.
+
+The data block of ``resources/pt_metal_rt.xdi`` is repeated until the
+file holds at least ``--rows`` data rows (100k by default). Both parsers
+only tokenize (no rdflib work), so the numbers isolate parsing cost.
+``mmap`` feeds the tokenizer from :mod:`sources` (memory-mapped
+``memoryview`` lines) instead of a text-mode file.
+
+Usage::
+
+    python benchmarks/bench_xdi_parser.py --rows 200000
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "api"))
+
+from sources import open_source  # noqa: E402
+from xdi import DataRow, HeaderField, iter_xdi_events  # noqa: E402
+
+
+def build_scaled_xdi(source_path: str, rows: int) -> str:
+    with open(source_path) as f:
+        lines = f.read().splitlines()
+    header = [line for line in lines if line.startswith("#")]
+    data = [line for line in lines if line.strip() and not line.startswith("#")]
+    fd, path = tempfile.mkstemp(suffix=".xdi")
+    with os.fdopen(fd, "w") as f:
+        f.write("\n".join(header) + "\n")
+        written = 0
+        while written < rows:
+            chunk = data[: rows - written]
+            f.write("\n".join(chunk) + "\n")
+            written += len(chunk)
+    return path
+
+
+def legacy_parse(path: str):
+    headers, rows = 0, 0
+    with open(path) as f:
+        text = f.read()
+    for line in text.split("\n"):
+        if line.startswith("#"):
+            if ":" in line:
+                name = re.search(r"#\s+(.*)\:", line)
+                value = re.search(r"\:\s*(.*)", line)
+                if name and value:
+                    headers += 1
+        else:
+            line.strip().split(" ")
+            rows += 1
+    return headers, rows
+
+
+def streaming_parse(path: str):
+    headers, rows = 0, 0
+    with open(path) as f:
+        for event in iter_xdi_events(f):
+            if isinstance(event, HeaderField):
+                headers += 1
+            elif isinstance(event, DataRow):
+                rows += 1
+    return headers, rows
+
+
+def mmap_parse(path: str):
+    headers, rows = 0, 0
+    for event in iter_xdi_events(open_source(path).iter_lines()):
+        if isinstance(event, HeaderField):
+            headers += 1
+        elif isinstance(event, DataRow):
+            rows += 1
+    return headers, rows
+
+
+def measure(label: str, func, path: str, repeat: int) -> None:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} best {best * 1000:9.1f} ms   peak {peak / 1024 / 1024:8.2f} MiB   headers/rows {result}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--source", default=os.path.join(REPO_ROOT, "resources", "pt_metal_rt.xdi"))
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    path = build_scaled_xdi(args.source, args.rows)
+    try:
+        print(f"{args.rows} data rows, {os.path.getsize(path) / 1024 / 1024:.1f} MiB")
+        measure("legacy", legacy_parse, path, args.repeat)
+        measure("streaming", streaming_parse, path, args.repeat)
+        measure("mmap", mmap_parse, path, args.repeat)
+    finally:
+        os.unlink(path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
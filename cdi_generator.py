@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import glob
 import os
 import sys
 import json
-from typing import Optional
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
 import rdflib
 
+EXPORT_EXTENSIONS = {
+    "json-ld": ".jsonld",
+    "flattened": ".jsonld",
+    "turtle": ".ttl",
+}
+STREAM_FORMATS = ("nquads", "jsonl")
+
 
 def resolve_api_path() -> None:
     repo_root = os.path.dirname(os.path.abspath(__file__))
@@ -14,101 +25,249 @@ def resolve_api_path() -> None:
         sys.path.insert(0, api_path)
 
 
-def generate_cdi(source_url: str, export_path: str, export_format: str, resources_dir: Optional[str], dataset_type: Optional[str], datasetid: Optional[str] = None, datasetversion: Optional[str] = None) -> None:
+def generate_cdi(source_url: str, export_path: str, export_format: str, resources_dir: Optional[str], dataset_type: Optional[str], datasetid: Optional[str] = None, datasetversion: Optional[str] = None, enrich: bool = True, timer=None, source=None) -> None:
+    """
+    Parse ``source_url`` into a CDI graph, merge the dataset's schema.org
+    metadata (``api/schemaorg.py``: fetched while parsing, cached, and
+    skipped when it takes longer than ``SCHEMAORG_DEADLINE``) and export
+    it when ``export_path`` is given. ``timer`` (an ``api/timing.py``
+    StageTimer) collects the parse/enrich/export times. ``source`` (an
+    ``api/sources.py`` Source) is read instead of opening ``source_url``
+    when its content is already at hand.
+    """
     resolve_api_path()
     from cdi import CDI_DDI
+    from timing import StageTimer
+
+    timer = timer if timer is not None else StageTimer()
+    started = time.monotonic()
+    # Fetch the dataset's schema.org export from Dataverse while the XDI file is parsed
+    pending = None
+    if enrich:
+        try:
+            import schemaorg
+
+            key = schemaorg.dataset_key(source_url, datasetid, datasetversion)
+            if key is not None:
+                pending = schemaorg.start_fetch(key)
+        except Exception as e:
+            print("Warning: schema.org enrichment unavailable: %s" % e)
 
     resources_dir_final = resources_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+    # Exported once below, after enrichment, by export_graph
     generator = CDI_DDI(
-        url=source_url,
-        export_file=export_path,
-        export_format=export_format,
+        url=source if source is not None else source_url,
         resources_dir=resources_dir_final,
         type=dataset_type,
     )
-    cdi_graph = generator.parse_cdi()
-    # Quick sanity/compatibility check of the CDI graph
-    try:
-        _ = cdi_graph.serialize(format="json-ld")
-    except Exception:
-        print("Warning: CDI graph serialization failed; using empty graph as fallback.")
-        cdi_graph = rdflib.Graph()
-    # Also enrich the graph with schema.org JSON-LD from Dataverse
-    schema_url = None
-    if datasetid:
-        # Try to infer base site from source_url; fallback to dev codata
-        try:
-            from urlparse import urlparse  # Python2 compat if needed
-        except Exception:
-            from urllib.parse import urlparse
-        try:
-            parsed = urlparse(source_url)
-            base = parsed.scheme + "://" + parsed.netloc if parsed.scheme and parsed.netloc else "https://dataverse.dev.codata.org"
-        except Exception:
-            base = "https://dataverse.dev.codata.org"
-        schema_url = base.rstrip("/") + "/api/datasets/export?exporter=schema.org&persistentId=" + datasetid
-    else:
-        # Default example fallback if no datasetid provided
-        schema_url = "https://dataverse.dev.codata.org/api/datasets/export?exporter=schema.org&persistentId=doi%3A10.5072/FK2/8MODGT"
-    try:
-        schema_graph = rdflib.Graph()
-        schema_graph.parse(schema_url, format="json-ld")
-        # Merge schema_graph into cdi_graph
-        for triple in schema_graph:
-            cdi_graph.add(triple)
-    except Exception:
-        # Ignore enrichment errors to not block core generation
-        pass
+    with timer.stage("parse"):
+        cdi_graph = generator.parse_cdi()
+    if pending is not None:
+        # Whatever is left of the deadline; errors and late exports are skipped
+        with timer.stage("enrich"):
+            triples = schemaorg.wait(key, pending, schemaorg.DEADLINE - (time.monotonic() - started))
+            if triples:
+                cdi_graph.addN((s, p, o, cdi_graph) for s, p, o in triples)
     if export_path and export_format:
+        with timer.stage("export"):
+            export_graph(cdi_graph, export_path, export_format)
+        print("Exported CDI graph to %s (%s)" % (export_path, export_format))
+    return cdi_graph
+
+
+def export_graph(cdi_graph: rdflib.Graph, export_path: str, export_format: str) -> None:
+    if export_format in ("json-ld", "flattened"):
+        resolve_api_path()
+        from jsonldemit import graph_to_jsonld
+
+        graph_nodes = graph_to_jsonld(cdi_graph)
         if export_format == "json-ld":
-            raw_jsonld = cdi_graph.serialize(format="json-ld")
-            try:
-                parsed = json.loads(raw_jsonld)
-            except Exception:
-                parsed = {"@graph": []}
-            if isinstance(parsed, dict) and "@graph" in parsed:
-                graph_nodes = parsed["@graph"]
-            elif isinstance(parsed, list):
-                graph_nodes = parsed
-            else:
-                graph_nodes = [parsed]
-            wrapped = {
-                "@graph": graph_nodes
-            }
-            with open(export_path, "w") as f:
-                f.write(json.dumps(wrapped, indent=2, ensure_ascii=False))
-        elif export_format == "flattened":
-            raw_jsonld = cdi_graph.serialize(format="json-ld")
+            exported = {"@graph": graph_nodes}
+        else:
             try:
                 from pyld import jsonld as jsonldlib
-                doc = json.loads(raw_jsonld)
-                flattened = jsonldlib.flatten(doc)
-                with open(export_path, "w") as f:
-                    f.write(json.dumps(flattened, indent=2, ensure_ascii=False))
+                exported = jsonldlib.flatten(graph_nodes)
             except Exception:
-                # Fallback to raw JSON-LD if pyld not available
-                with open(export_path, "w") as f:
-                    f.write(raw_jsonld)
-        else:
-            cdi_graph.serialize(destination=export_path, format=export_format)
-        print("Exported CDI graph to %s (%s)" % (export_path, export_format))
-    return cdi_graph
+                # Fallback to the unflattened nodes if pyld not available
+                exported = graph_nodes
+        with open(export_path, "w") as f:
+            f.write(json.dumps(exported, indent=2, ensure_ascii=False, allow_nan=False))
+    else:
+        cdi_graph.serialize(destination=export_path, format=export_format)
+
+
+def is_url(source: str) -> bool:
+    return "://" in source
+
+
+def iter_batch_inputs(source: str, pattern: str = "*.xdi") -> List[str]:
+    """
+    Expand a batch source into a list of inputs.
+
+    ``source`` is a directory (searched recursively for ``pattern``), a
+    glob expression, or a manifest file with one URL or path per line
+    (blank lines and ``#`` comments are ignored; relative paths are
+    resolved against the manifest's directory).
+    """
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "**", pattern), recursive=True))
+    if glob.has_magic(source):
+        return sorted(path for path in glob.glob(source, recursive=True) if os.path.isfile(path))
+    inputs = []
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            inputs.append(line if is_url(line) or os.path.isabs(line) else os.path.join(base, line))
+    return inputs
+
+
+def batch_output_paths(inputs: List[str], out_dir: str, export_format: str) -> List[str]:
+    """One output file per input, named after the input and made unique on collisions."""
+    ext = EXPORT_EXTENSIONS.get(export_format, "." + export_format)
+    seen: Dict[str, int] = {}
+    paths = []
+    for source in inputs:
+        name = os.path.splitext(os.path.basename(source.split("?", 1)[0].rstrip("/")))[0] or "cdi"
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            name = "%s-%d" % (name, count)
+        paths.append(os.path.join(out_dir, name + ext))
+    return paths
+
+
+def graph_name(source: str) -> str:
+    return source if is_url(source) else "file://" + os.path.abspath(source)
+
+
+def stream_record(graph: rdflib.Graph, source: str, stream_format: str) -> str:
+    """Serialize one result graph as a chunk of the concatenated batch stream."""
+    name = graph_name(source)
+    if stream_format == "nquads":
+        lines = []
+        for line in graph.serialize(format="nt").splitlines():
+            if line.endswith(" ."):
+                lines.append("%s <%s> .\n" % (line[:-2], name))
+        return "".join(lines)
+    resolve_api_path()
+    from jsonldemit import graph_to_jsonld
+
+    doc = graph_to_jsonld(graph)
+    return json.dumps({"source": source, "@id": name, "@graph": doc}, ensure_ascii=False, allow_nan=False) + "\n"
+
+
+def _init_batch_worker(resources_dir: Optional[str], dataset_type: Optional[str]) -> None:
+    # Parse the vocabulary once per worker process; every file it converts reuses it
+    resolve_api_path()
+    from graphstore import get_vocabulary
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        get_vocabulary(resources_dir, dataset_type)
+
+
+def _convert_batch_item(source: str, export_path: Optional[str], export_format: str, stream_format: Optional[str], resources_dir: Optional[str], dataset_type: Optional[str], enrich: bool) -> Dict:
+    start = time.perf_counter()
+    result = {"source": source, "output": export_path, "ok": False, "error": None, "triples": 0, "record": None}
+    try:
+        # generate_cdi's per-file progress output is noise at batch scale
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            graph = generate_cdi(source, export_path, export_format, resources_dir, dataset_type, enrich=enrich)
+            if stream_format:
+                result["record"] = stream_record(graph, source, stream_format)
+        result["triples"] = len(graph)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(inputs: List[str], out_dir: Optional[str], stream_path: Optional[str], export_format: str, stream_format: str, resources_dir: Optional[str], dataset_type: Optional[str], workers: Optional[int] = None, enrich: bool = True) -> int:
+    """
+    Convert ``inputs`` across a process pool.
+
+    Writes one file per input into ``out_dir``, or appends every result to
+    the single ``stream_path`` stream (``-`` for stdout). Failures are
+    reported per file and do not stop the run; returns the number of
+    failed inputs.
+    """
+    resources_dir = resources_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+    if stream_path:
+        outputs = [None] * len(inputs)
+    else:
+        os.makedirs(out_dir, exist_ok=True)
+        outputs = batch_output_paths(inputs, out_dir, export_format)
+    total = len(inputs)
+    failures = []
+    triples = 0
+    start = time.perf_counter()
+    stream = None
+    if stream_path:
+        stream = sys.stdout if stream_path == "-" else open(stream_path, "w")
+    log = sys.stderr
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(resources_dir, dataset_type)) as pool:
+            futures = [
+                pool.submit(_convert_batch_item, source, output, export_format, stream_format if stream else None, resources_dir, dataset_type, enrich)
+                for source, output in zip(inputs, outputs)
+            ]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if result["ok"]:
+                    triples += result["triples"]
+                    if stream:
+                        stream.write(result["record"])
+                    status = "ok"
+                else:
+                    failures.append(result)
+                    status = "FAILED " + result["error"]
+                print("[%d/%d] %s %s (%.2fs)" % (done, total, result["source"], status, result["seconds"]), file=log)
+    finally:
+        if stream and stream is not sys.stdout:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    print(
+        "Converted %d/%d inputs (%d failed), %d triples in %.1fs: %.2f files/s, %.0f triples/s"
+        % (total - len(failures), total, len(failures), triples, elapsed, total / elapsed if elapsed else 0.0, triples / elapsed if elapsed else 0.0),
+        file=log,
+    )
+    for result in failures:
+        print("  failed: %s: %s" % (result["source"], result["error"]), file=log)
+    return len(failures)
 
 
 def main(argv: Optional[list] = None) -> int:
     parser = argparse.ArgumentParser(description="Generate CDI graph from a source URL and export to JSON-LD/Turtle.")
-    parser.add_argument("--url", required=True, help="Source URL containing text representation to parse into CDI.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--url", help="Source URL containing text representation to parse into CDI.")
+    source.add_argument("--batch", help="Directory, glob or manifest file (one URL/path per line) of inputs to convert in parallel.")
     parser.add_argument("--out", default="cdi.jsonld", help="Output file path. Default: cdi.jsonld")
     parser.add_argument("--format", dest="fmt", default="json-ld", choices=["json-ld", "turtle"], help="Export format. Default: json-ld")
     parser.add_argument("--resources", default=None, help="Path to resources directory (defaults to ./resources).")
     parser.add_argument("--type", dest="dataset_type", default="xas", help="Dataset type key to load resources for. Default: xas")
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--pattern", default="*.xdi", help="File pattern when --batch is a directory. Default: *.xdi")
+    batch.add_argument("--workers", type=int, default=None, help="Worker processes. Default: number of CPUs")
+    batch.add_argument("--out-dir", default="cdi-out", help="Directory for one output file per input. Default: cdi-out")
+    batch.add_argument("--stream", default=None, help="Write all results to one concatenated stream instead (file path or - for stdout).")
+    batch.add_argument("--stream-format", default="nquads", choices=STREAM_FORMATS, help="Format of --stream: nquads (one named graph per input) or jsonl. Default: nquads")
+    batch.add_argument("--no-enrich", action="store_true", help="Skip the schema.org enrichment request for every input.")
     args = parser.parse_args(argv)
 
     resolve_api_path()
+    if args.batch:
+        inputs = iter_batch_inputs(args.batch, args.pattern)
+        if not inputs:
+            print("No inputs found for %s" % args.batch, file=sys.stderr)
+            return 1
+        failed = run_batch(inputs, args.out_dir, args.stream, args.fmt, args.stream_format, args.resources, args.dataset_type, workers=args.workers, enrich=not args.no_enrich)
+        return 1 if failed else 0
     generate_cdi(args.url, args.out, args.fmt, args.resources, args.dataset_type)
     return 0
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
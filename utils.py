@@ -6,16 +6,46 @@ Includes helpers for loading the XDI–CDIF mapping spreadsheet that
 is stored in this repository under ``resources/XDI-CDIF-Mapping.xlsx``
 and published via GitHub at:
 `https://github.com/codata/cdi-xas/raw/refs/heads/ai/resources/XDI-CDIF-Mapping.xlsx`.
+
+Parsed mappings are cached per process by :func:`get_xdi_cdif_mapping`
+in a bounded LRU (``MAPPING_CACHE_SIZE``; local files keyed by path and
+validated by mtime/size and SHA-256, remote spreadsheets revalidated
+with their ``ETag``/``Last-Modified``). Loads are serialised per source
+only, so a slow download does not hold up other mappings.
+Spreadsheets are parsed from memory by :func:`spreadsheet.read_sheet`,
+which yields the same DataFrame as ``pandas.read_excel``.
 """
 
+import contextlib
+import hashlib
 import json
 import os
-from io import BytesIO
-from typing import Any, Dict, Optional
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 import requests
 
+from spreadsheet import read_sheet
+
+try:
+    from cache import TTLCache
+except ImportError:
+    # Run from the repository: api/ holds the shared modules
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+    from cache import TTLCache
+
+try:
+    # Shared keep-alive session from api/httpclient.py (flat in the image)
+    from httpclient import get_session
+except ImportError:
+    _session = requests.Session()
+
+    def get_session() -> requests.Session:
+        return _session
+
 
 def get_repo_root() -> str:
     """
@@ -37,10 +67,18 @@ def get_resources_dir(resources_dir: Optional[str] = None) -> str:
     return os.path.join(get_repo_root(), "resources")
 
 
+DEFAULT_MAPPING_URL = "https://github.com/codata/cdi-xas/raw/refs/heads/ai/resources/XDI-CDIF-Mapping.xlsx"
+DEFAULT_MAPPING_BASE_URI = "https://w3id.org/cdi-xas/mapping/"
+# Seconds a remote mapping is served before it is revalidated with its ETag
+MAPPING_REVALIDATE_SECONDS = float(os.environ.get("MAPPING_REVALIDATE_SECONDS", 300))
+# Parsed mappings kept per process (sources are caller-supplied URLs/paths)
+MAPPING_CACHE_SIZE = int(os.environ.get("MAPPING_CACHE_SIZE", 16))
+
+
 def load_xdi_cdif_mapping(
     resources_dir: Optional[str] = None,
     use_remote_fallback: bool = True,
-    mapping_url: str = "https://github.com/codata/cdi-xas/raw/refs/heads/ai/resources/XDI-CDIF-Mapping.xlsx",
+    mapping_url: str = DEFAULT_MAPPING_URL,
 ) -> pd.DataFrame:
     """
     Load the XDI–CDIF mapping spreadsheet as a :class:`pandas.DataFrame`.
@@ -79,7 +117,8 @@ def load_xdi_cdif_mapping(
 
     # Prefer local copy if available
     if os.path.exists(local_path):
-        return pd.read_excel(local_path)
+        with open(local_path, "rb") as f:
+            return read_sheet(f.read())
 
     if not use_remote_fallback:
         raise FileNotFoundError(
@@ -87,20 +126,16 @@ def load_xdi_cdif_mapping(
         )
 
     # Fallback: fetch from the provided URL
-    response = requests.get(mapping_url, timeout=30)
+    response = get_session().get(mapping_url, timeout=30)
     response.raise_for_status()
-    return pd.read_excel(BytesIO(response.content))
+    return read_sheet(response.content)
 
 
-def _parse_json_like_fragment(fragment: str) -> Any:
+def _json_like_fragment_candidates(fragment: str) -> List[str]:
     """
-    Try to interpret a JSON-like fragment such as::
-
-        "prop": [ { ... ],
-
-    as a proper JSON object. On success returns the parsed Python
-    structure (typically a dict); on failure returns the original
-    fragment string.
+    JSON texts to try for a JSON-like fragment such as ``"prop": [ { ...``:
+    the fragment wrapped in braces with unbalanced brackets closed, then
+    the plain wrapped fragment.
     """
     # Normalise whitespace and trailing commas
     fragment = fragment.strip().rstrip(",")
@@ -136,8 +171,20 @@ def _parse_json_like_fragment(fragment: str) -> Any:
     # Also try the simpler case (only wrapping, no balancing)
     if balanced != fragment:
         candidates.append("{" + fragment + "}")
+    return candidates
 
-    for wrapped in candidates:
+
+def _parse_json_like_fragment(fragment: str) -> Any:
+    """
+    Try to interpret a JSON-like fragment such as::
+
+        "prop": [ { ... ],
+
+    as a proper JSON object. On success returns the parsed Python
+    structure (typically a dict); on failure returns the original
+    fragment string.
+    """
+    for wrapped in _json_like_fragment_candidates(fragment):
         try:
             return json.loads(wrapped)
         except Exception:
@@ -146,6 +193,46 @@ def _parse_json_like_fragment(fragment: str) -> Any:
     return fragment
 
 
+def _normalise_column_name(col: Any) -> str:
+    """
+    Normalise Excel auto-generated headers like ``"Unnamed: 2"`` to a more
+    stable form such as ``"Column 2"``; other headers are kept as strings.
+    """
+    col_name = str(col)
+    if col_name.startswith("Unnamed:"):
+        _, _, suffix = col_name.partition(":")
+        suffix = suffix.strip()
+        col_name = f"Column {suffix}" if suffix else "Column"
+    return col_name
+
+
+def _json_cell_text(value: str) -> Optional[str]:
+    """
+    Return the JSON text a string cell should be parsed from, or ``None``
+    to keep the cell as a plain string.
+
+    Complete JSON values (starting with ``{`` or ``[``) are used as-is;
+    fragments starting with a quoted key are wrapped/balanced with
+    :func:`_json_like_fragment_candidates`.
+    """
+    stripped = value.strip()
+    # Case 1: complete JSON string (starts with { or [)
+    if stripped.startswith("{") or stripped.startswith("["):
+        candidates = [stripped]
+    # Case 2: JSON-like fragment starting with a quoted key
+    elif stripped.startswith('"') and '":' in stripped:
+        candidates = _json_like_fragment_candidates(stripped)
+    else:
+        return None
+    for candidate in candidates:
+        try:
+            json.loads(candidate)
+        except Exception:
+            continue
+        return candidate
+    return None
+
+
 def xdi_cdif_mapping_to_jsonld(
     df: pd.DataFrame,
     base_uri: str = "https://w3id.org/cdi-xas/mapping/",
@@ -156,6 +243,13 @@ def xdi_cdif_mapping_to_jsonld(
 
     Each row becomes a node in the ``@graph``. Columns are turned into JSON
     properties using the column names as keys; empty/NaN values are omitted.
+    String values that look like JSON (or JSON fragments such as
+    ``"schema:additionalProperty": [ {...} ]``) are parsed into structured
+    values.
+
+    The conversion works column by column: headers are normalised once,
+    NaNs are masked per column, and only string columns that contain
+    JSON-looking cells are parsed, with identical cells analysed once.
 
     Parameters
     ----------
@@ -173,46 +267,32 @@ def xdi_cdif_mapping_to_jsonld(
         A JSON-LD document of the form ``{\"@graph\": [...]}``, optionally
         including an ``\"@context\"``.
     """
-    graph = []
-    for idx, row in df.iterrows():
-        node: Dict[str, Any] = {"@id": f"{base_uri}{idx}"}
-        for col, value in row.items():
-            # Skip entirely empty cells
-            if pd.isna(value):
+    graph: List[Dict[str, Any]] = [{"@id": f"{base_uri}{idx}"} for idx in df.index]
+    # Cell text -> JSON text to parse (or None); shared by all columns
+    json_texts: Dict[str, Optional[str]] = {}
+    for col, series in df.items():
+        col_name = _normalise_column_name(col)
+        present = series.notna().tolist()
+        values = series.tolist()
+        textual = pd.api.types.is_string_dtype(series.dtype) or pd.api.types.is_object_dtype(series.dtype)
+        if not textual or not any(
+            isinstance(value, str) and value.lstrip()[:1] in ("{", "[", '"') for value in values
+        ):
+            for node, value, keep in zip(graph, values, present):
+                if keep:
+                    node[col_name] = value
+            continue
+        for node, value, keep in zip(graph, values, present):
+            if not keep:
                 continue
-            col_name = str(col)
-            # Normalise Excel auto-generated headers like "Unnamed: 2" to a
-            # more stable form such as "Column2"
-            if col_name.startswith("Unnamed:"):
-                _, _, suffix = col_name.partition(":")
-                suffix = suffix.strip()
-                # e.g. "Unnamed: 2" -> "Column 2"
-                col_name = f"Column {suffix}" if suffix else "Column"
-
-            # Try to interpret string values that look like JSON fragments
-            # (e.g. `"schema:additionalProperty": [ {...} ]`) as structured
-            # objects, otherwise keep the original value.
             if isinstance(value, str):
-                stripped = value.strip()
-                parsed_value: Any = value
-
-                # Case 1: complete JSON string (starts with { or [)
-                if stripped.startswith("{") or stripped.startswith("["):
-                    try:
-                        parsed_value = json.loads(stripped)
-                    except Exception:
-                        parsed_value = value
-                # Case 2: JSON-like fragment starting with a quoted key
-                elif stripped.startswith('"') and '":' in stripped:
-                    maybe_parsed = _parse_json_like_fragment(stripped)
-                    # Accept only if we actually got a structured value back
-                    if not isinstance(maybe_parsed, str):
-                        parsed_value = maybe_parsed
-
-                node[col_name] = parsed_value
+                if value not in json_texts:
+                    json_texts[value] = _json_cell_text(value)
+                text = json_texts[value]
+                # Parse per cell so nodes never share mutable values
+                node[col_name] = json.loads(text) if text is not None else value
             else:
                 node[col_name] = value
-        graph.append(node)
 
     jsonld: Dict[str, Any] = {"@graph": graph}
     if context is not None:
@@ -223,16 +303,24 @@ def xdi_cdif_mapping_to_jsonld(
 def load_xdi_cdif_mapping_jsonld(
     resources_dir: Optional[str] = None,
     use_remote_fallback: bool = True,
-    mapping_url: str = "https://github.com/codata/cdi-xas/raw/refs/heads/ai/resources/XDI-CDIF-Mapping.xlsx",
-    base_uri: str = "https://w3id.org/cdi-xas/mapping/",
+    mapping_url: str = DEFAULT_MAPPING_URL,
+    base_uri: str = DEFAULT_MAPPING_BASE_URI,
     context: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Convenience helper that loads the XDI–CDIF mapping and returns it as JSON-LD.
 
     Parameters mirror :func:`load_xdi_cdif_mapping` and
-    :func:`xdi_cdif_mapping_to_jsonld`.
+    :func:`xdi_cdif_mapping_to_jsonld`. With the default ``base_uri`` and
+    no ``context`` the result comes from the shared mapping cache and
+    must not be modified.
     """
+    if base_uri == DEFAULT_MAPPING_BASE_URI and context is None:
+        return get_xdi_cdif_mapping(
+            resources_dir=resources_dir,
+            use_remote_fallback=use_remote_fallback,
+            mapping_url=mapping_url,
+        ).jsonld
     df = load_xdi_cdif_mapping(
         resources_dir=resources_dir,
         use_remote_fallback=use_remote_fallback,
@@ -323,6 +411,156 @@ def xdi_cdif_mapping_to_rml(
     return "\n".join(lines)
 
 
+class XDICDIFMapping:
+    """
+    One parsed mapping spreadsheet with its derived representations:
+    ``dataframe``, ``jsonld`` (dict), ``jsonld_bytes`` (the dict encoded
+    once with :func:`json.dumps` defaults, ready to be embedded in a
+    response) and ``rml`` (Turtle string).
+
+    Instances are shared between requests; treat them as read-only.
+    """
+
+    def __init__(self, source: str, dataframe: pd.DataFrame, validator: Tuple = ()):
+        self.source = source
+        self.validator = validator
+        self.checked_at = time.monotonic()
+        self.dataframe = dataframe
+        self.jsonld = xdi_cdif_mapping_to_jsonld(dataframe)
+        self.jsonld_bytes = json.dumps(self.jsonld).encode("utf-8")
+        self.rml = xdi_cdif_mapping_to_rml(dataframe)
+
+
+_mappings = TTLCache(maxsize=MAPPING_CACHE_SIZE, ttl=86400)
+# Source -> [lock, holders]: one load at a time per source, entries
+# dropped once nobody holds them
+_loading: Dict[str, List] = {}
+_loading_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _source_lock(source: str):
+    with _loading_lock:
+        entry = _loading.setdefault(source, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _loading_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _loading[source]
+
+
+def _load_local_mapping(path: str) -> XDICDIFMapping:
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _mappings.get(path)
+    if cached is not None and cached.validator[:2] == signature:
+        return cached
+    # Read once: the same bytes are hashed and, if changed, parsed
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if cached is not None and cached.validator[2] == digest:
+        # Touched but unchanged
+        cached.validator = signature + (digest,)
+        return cached
+    mapping = XDICDIFMapping(path, read_sheet(data), signature + (digest,))
+    _mappings.set(path, mapping)
+    return mapping
+
+
+def _load_remote_mapping(url: str) -> XDICDIFMapping:
+    cached = _mappings.get(url)
+    if cached is not None and time.monotonic() - cached.checked_at < MAPPING_REVALIDATE_SECONDS:
+        return cached
+    headers = {}
+    if cached is not None:
+        etag, last_modified = cached.validator
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    try:
+        response = get_session().get(url, headers=headers, timeout=30)
+        if cached is not None and response.status_code == 304:
+            cached.checked_at = time.monotonic()
+            return cached
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if cached is None:
+            raise
+        # Keep serving the last good copy while the remote is unavailable
+        print("Warning: could not revalidate mapping %s: %s" % (url, e))
+        cached.checked_at = time.monotonic()
+        return cached
+    validator = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    mapping = XDICDIFMapping(url, read_sheet(response.content), validator)
+    _mappings.set(url, mapping)
+    return mapping
+
+
+def get_xdi_cdif_mapping(
+    source: Optional[str] = None,
+    resources_dir: Optional[str] = None,
+    use_remote_fallback: bool = True,
+    mapping_url: str = DEFAULT_MAPPING_URL,
+) -> XDICDIFMapping:
+    """
+    Return the cached :class:`XDICDIFMapping` for ``source``.
+
+    Parameters
+    ----------
+    source:
+        Local path or ``http(s)`` URL of a mapping spreadsheet. When
+        omitted, the default mapping is used with the same resolution as
+        :func:`load_xdi_cdif_mapping` (local resources first, then
+        ``mapping_url`` if ``use_remote_fallback`` is set).
+
+    Raises
+    ------
+    FileNotFoundError
+        If no source is given, the local file is missing and
+        ``use_remote_fallback`` is ``False``.
+    requests.HTTPError
+        If a remote spreadsheet cannot be downloaded and no copy is cached.
+    """
+    if source is None:
+        local_path = os.path.join(get_resources_dir(resources_dir), "XDI-CDIF-Mapping.xlsx")
+        if os.path.exists(local_path):
+            source = local_path
+        elif use_remote_fallback:
+            source = mapping_url
+        else:
+            raise FileNotFoundError(
+                f"XDI–CDIF mapping not found at {local_path} and remote fallback disabled."
+            )
+    if source.startswith(("http://", "https://")):
+        cached = _mappings.get(source)
+        if cached is not None and time.monotonic() - cached.checked_at < MAPPING_REVALIDATE_SECONDS:
+            return cached
+        with _source_lock(source):
+            return _load_remote_mapping(source)
+    path = os.path.abspath(source)
+    with _source_lock(path):
+        return _load_local_mapping(path)
+
+
+def warm_xdi_cdif_mapping(resources_dir: Optional[str] = None) -> Optional[XDICDIFMapping]:
+    """Load the default mapping into the cache; errors are reported, not raised."""
+    try:
+        return get_xdi_cdif_mapping(resources_dir=resources_dir)
+    except Exception as e:
+        print("Warning: could not preload the XDI–CDIF mapping: %s" % e)
+        return None
+
+
+def clear_xdi_cdif_mappings() -> None:
+    _mappings.clear()
+
+
 __all__ = [
     "get_repo_root",
     "get_resources_dir",
@@ -330,6 +568,10 @@ __all__ = [
     "xdi_cdif_mapping_to_jsonld",
     "load_xdi_cdif_mapping_jsonld",
     "xdi_cdif_mapping_to_rml",
+    "XDICDIFMapping",
+    "get_xdi_cdif_mapping",
+    "warm_xdi_cdif_mapping",
+    "clear_xdi_cdif_mappings",
 ]
 
 